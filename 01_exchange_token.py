@@ -1,7 +1,10 @@
 import os
-import requests
+
+import orjson
 from dotenv import load_dotenv
 
+from zoho_http import SESSION
+
 load_dotenv()
 
 ACCOUNTS_URL = os.getenv("ZOHO_ACCOUNTS_URL", "https://accounts.zoho.com").rstrip("/")
@@ -30,11 +33,11 @@ data = {
     "grant_type": "authorization_code",
 }
 
-resp = requests.post(token_url, data=data, timeout=30)
+resp = SESSION.post(token_url, data=data, timeout=30)
 
 print("Status:", resp.status_code)
 try:
-    payload = resp.json()
+    payload = orjson.loads(resp.content)
 except Exception:
     print(resp.text)
     raise
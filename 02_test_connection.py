@@ -1,22 +1,22 @@
-import os
-import requests
+import orjson
 from dotenv import load_dotenv
-from zoho_auth import get_access_token
+from zoho_auth import CONFIG, get_access_token
+from zoho_http import SESSION
 
 load_dotenv()
 
+ORGS_URL = f"{CONFIG.api_domain}/books/v3/organizations"
+
 def main():
-    api_domain = os.getenv("ZOHO_API_DOMAIN", "https://www.zohoapis.com")
-    org_id = os.getenv("ZOHO_ORG_ID")
+    org_id = CONFIG.org_id
 
     access_token = get_access_token()
 
-    url = f"{api_domain}/books/v3/organizations"
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+    SESSION.headers.update({"Authorization": f"Zoho-oauthtoken {access_token}"})
 
-    r = requests.get(url, headers=headers, timeout=30)
+    r = SESSION.get(ORGS_URL, timeout=30)
     print("Status:", r.status_code)
-    data = r.json()
+    data = orjson.loads(r.content)
     print(data)
 
     # org_id가 목록에 있는지 간단 체크
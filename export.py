@@ -2,11 +2,23 @@ import argparse
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import orjson
 
 from zoho_client import ZohoClient
 
+# per_invoice 결제 조회 기본 동시 실행 수 (세션 풀 크기 20 이내로 유지)
+PAYMENT_WORKERS = 8
+# --concurrency 상한 (세션 풀 크기 20 안에서 재시도 여유를 남긴다)
+MAX_PAYMENT_WORKERS = 16
+# JSONL 쓰기 버퍼 크기 (작은 write syscall 방지)
+WRITE_BUFFER_SIZE = 1 << 20
+# invoice_payments 엔드포인트 probe 결과 캐시 (org_id별)
+ENDPOINT_CACHE_PATH = ".zoho_endpoints_cache.json"
+
 RESOURCE_CONFIG = {
     "contacts": {"path": "/books/v3/contacts", "list_key": "contacts"},
     "items": {"path": "/books/v3/items", "list_key": "items"},
@@ -30,30 +42,93 @@ def parse_resources(raw: str) -> List[str]:
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
-def write_jsonl(path: str, records: Iterable[Dict[str, object]]) -> int:
+def write_records(f: BinaryIO, records: Iterable[Dict[str, object]]) -> int:
+    # 레코드 단위로 버퍼에 쓰면 페이지 전체 크기의 인코딩 버퍼를 따로 만들지 않는다
     count = 0
-    with open(path, "w", encoding="utf-8") as f:
-        for record in records:
-            f.write(json.dumps(record, ensure_ascii=True))
-            f.write("\n")
-            count += 1
+    for record in records:
+        f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+        count += 1
     return count
 
-def fetch_invoice_ids(client: ZohoClient, per_page: int) -> List[str]:
-    invoice_ids: List[str] = []
+def write_jsonl(path: str, records: Iterable[Dict[str, object]]) -> int:
+    with open(path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        return write_records(f, records)
+
+def fetch_invoice_payments(
+    client: ZohoClient,
+    path_template: str,
+    list_key: str,
+    invoice_id: str,
+    params: Dict[str, object],
+    per_page: int,
+) -> List[Dict[str, object]]:
+    payments: List[Dict[str, object]] = []
+    for _, page_payments in client.get_paginated(
+        path_template.format(invoice_id=invoice_id),
+        params=params,
+        list_key=list_key,
+        per_page=per_page,
+    ):
+        payments.extend(page_payments)
+    return payments
+
+
+def fetch_invoice_ids(
+    client: ZohoClient, per_page: int, known_ids: Optional[Dict[str, None]] = None
+) -> List[str]:
+    # 'invoices' 단계가 이미 실행됐다면 (비어 있어도) 다시 페이지네이션하지 않는다
+    if known_ids is not None:
+        return list(known_ids)
+    # dict 키로 중복 제거하면서 페이지 순서 유지
+    invoice_ids: Dict[str, None] = {}
     for _, invoices in client.get_paginated(
         "/books/v3/invoices", params=None, list_key="invoices", per_page=per_page
     ):
         for invoice in invoices:
             invoice_id = invoice.get("invoice_id")
             if invoice_id:
-                invoice_ids.append(str(invoice_id))
-    return invoice_ids
+                invoice_ids[str(invoice_id)] = None
+    return list(invoice_ids)
+
+def _read_endpoint_cache() -> Dict[str, object]:
+    try:
+        with open(ENDPOINT_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def _write_endpoint_cache(cache: Dict[str, object]) -> None:
+    tmp_path = f"{ENDPOINT_CACHE_PATH}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=True, indent=2)
+        os.replace(tmp_path, ENDPOINT_CACHE_PATH)
+    except OSError:
+        pass
+
+def load_cached_endpoint(org_id: Optional[str]) -> Optional[Dict[str, object]]:
+    candidate = _read_endpoint_cache().get(str(org_id))
+    if not isinstance(candidate, dict) or "path_template" not in candidate:
+        return None
+    return candidate
+
+def save_cached_endpoint(org_id: Optional[str], candidate: Dict[str, object]) -> None:
+    cache = _read_endpoint_cache()
+    cache[str(org_id)] = candidate
+    _write_endpoint_cache(cache)
+
+def drop_cached_endpoint(org_id: Optional[str]) -> None:
+    cache = _read_endpoint_cache()
+    if cache.pop(str(org_id), None) is not None:
+        _write_endpoint_cache(cache)
 
 def probe_invoice_payments_endpoint(
-    client: ZohoClient, invoice_ids: List[str]
+    client: ZohoClient,
+    invoice_ids: List[str],
+    candidates: Optional[List[Dict[str, object]]] = None,
 ) -> Optional[Dict[str, object]]:
-    candidates = [
+    candidates = candidates or [
         {
             "mode": "global",
             "path_template": "/books/v3/invoices/payments",
@@ -76,7 +151,7 @@ def probe_invoice_payments_endpoint(
             if candidate.get("invoice_id_param"):
                 params["invoice_id"] = invoice_id
             try:
-                payload = client.request("GET", path, params=params, max_retries=1)
+                payload = client.request("GET", path, params=params)
             except RuntimeError:
                 continue
             if candidate["list_key"] in payload:
@@ -89,58 +164,76 @@ def export_resource(
     output_dir: str,
     per_page: int,
     since: Optional[str],
-    invoice_ids: Optional[List[str]],
+    invoice_ids: Optional[Dict[str, None]],
+    concurrency: int = PAYMENT_WORKERS,
 ) -> Tuple[int, List[str]]:
     errors: List[str] = []
     count = 0
     file_path = os.path.join(output_dir, f"{resource}.jsonl")
 
     if resource == "invoice_payments":
-        if not invoice_ids:
-            invoice_ids = fetch_invoice_ids(client, per_page=per_page)
+        # 캐시가 있어도 ID가 필요하다 (캐시된 엔드포인트 확인, per_invoice 조회)
+        ids = fetch_invoice_ids(client, per_page, invoice_ids)
+        if not ids and invoice_ids is not None:
+            # 같은 실행의 'invoices' 단계가 0건이었다면 조회할 결제도 없다 (오류 아님)
+            print("invoice_payments: invoices returned no rows; nothing to fetch")
+            return 0, errors
+        if not ids:
+            errors.append("invoice_payments: no invoice_ids; run 'invoices' first")
+            return 0, errors
 
-        candidate = probe_invoice_payments_endpoint(client, invoice_ids)
+        candidate = load_cached_endpoint(client.org_id)
+        # 캐시된 엔드포인트가 오류를 내거나 list_key 없이 응답하면 캐시를 버리고 다시 probe
+        if candidate and not probe_invoice_payments_endpoint(client, ids, [candidate]):
+            print("invoice_payments: cached endpoint no longer responds as expected; re-probing")
+            drop_cached_endpoint(client.org_id)
+            candidate = None
         if not candidate:
-            errors.append("invoice_payments: unable to determine endpoint")
-            return 0, errors
+            candidate = probe_invoice_payments_endpoint(client, ids)
+            if not candidate:
+                errors.append("invoice_payments: unable to determine endpoint")
+                return 0, errors
+            save_cached_endpoint(client.org_id, candidate)
 
         if candidate["mode"] == "global":
             params = {}
             if since:
                 params["last_modified_time"] = since
             total = 0
-            with open(file_path, "w", encoding="utf-8") as f:
+            with open(file_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
                 for page, payments in client.get_paginated(
                     candidate["path_template"],
                     params=params,
                     list_key=candidate["list_key"],
                     per_page=per_page,
                 ):
-                    for payment in payments:
-                        f.write(json.dumps(payment, ensure_ascii=True))
-                        f.write("\n")
-                        total += 1
+                    total += write_records(f, payments)
                     print(f"invoice_payments: page {page}, total {total}")
             return total, errors
 
         total = 0
-        invoice_total = len(invoice_ids)
-        with open(file_path, "w", encoding="utf-8") as f:
-            for idx, invoice_id in enumerate(invoice_ids, start=1):
-                params = {}
-                if since:
-                    params["last_modified_time"] = since
-                for page, payments in client.get_paginated(
-                    candidate["path_template"].format(invoice_id=invoice_id),
-                    params=params,
-                    list_key=candidate["list_key"],
-                    per_page=per_page,
-                ):
-                    for payment in payments:
-                        f.write(json.dumps(payment, ensure_ascii=True))
-                        f.write("\n")
-                        total += 1
-                    print(f"invoice_payments: invoice {idx}/{invoice_total} page {page}, total {total}")
+        invoice_total = len(ids)
+        params = {}
+        if since:
+            params["last_modified_time"] = since
+        with open(file_path, "wb", buffering=WRITE_BUFFER_SIZE) as f, ThreadPoolExecutor(
+            max_workers=concurrency
+        ) as executor:
+            # 인보이스별 페이지 조회는 워커가, 파일 쓰기는 메인 스레드가 순서대로 처리
+            results = executor.map(
+                lambda invoice_id: fetch_invoice_payments(
+                    client,
+                    candidate["path_template"],
+                    candidate["list_key"],
+                    invoice_id,
+                    params,
+                    per_page,
+                ),
+                ids,
+            )
+            for idx, payments in enumerate(results, start=1):
+                total += write_records(f, payments)
+                print(f"invoice_payments: invoice {idx}/{invoice_total}, total {total}")
         return total, errors
 
     config = RESOURCE_CONFIG.get(resource)
@@ -153,21 +246,19 @@ def export_resource(
         params["last_modified_time"] = since
 
     total = 0
-    with open(file_path, "w", encoding="utf-8") as f:
+    with open(file_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
         for page, items in client.get_paginated(
             config["path"],
             params=params,
             list_key=config["list_key"],
             per_page=per_page,
         ):
-            for item in items:
-                if resource == "invoices" and invoice_ids is not None:
+            if resource == "invoices" and invoice_ids is not None:
+                for item in items:
                     invoice_id = item.get("invoice_id")
                     if invoice_id:
-                        invoice_ids.append(str(invoice_id))
-                f.write(json.dumps(item, ensure_ascii=True))
-                f.write("\n")
-                total += 1
+                        invoice_ids[str(invoice_id)] = None
+            total += write_records(f, items)
             print(f"{resource}: page {page}, total {total}")
 
     return total, errors
@@ -182,9 +273,22 @@ def main() -> None:
     )
     parser.add_argument("--since", default="none", help="Optional since filter, or 'none'.")
     parser.add_argument("--per-page", type=int, default=200, help="Pagination size (default 200).")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=PAYMENT_WORKERS,
+        help=f"Parallel per-invoice payment fetches (default {PAYMENT_WORKERS}, 1..{MAX_PAYMENT_WORKERS}).",
+    )
     args = parser.parse_args()
+    if not 1 <= args.concurrency <= MAX_PAYMENT_WORKERS:
+        parser.error(f"--concurrency must be between 1 and {MAX_PAYMENT_WORKERS}")
 
     resources = parse_resources(args.resources)
+    # invoice_payments가 invoices 단계에서 모은 ID를 재사용하도록 invoices를 먼저 실행
+    if "invoices" in resources and "invoice_payments" in resources:
+        if resources.index("invoice_payments") < resources.index("invoices"):
+            resources.remove("invoice_payments")
+            resources.insert(resources.index("invoices") + 1, "invoice_payments")
     since = None if args.since.lower() == "none" else args.since
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -194,7 +298,9 @@ def main() -> None:
     client = ZohoClient()
     start = time.time()
 
-    invoice_ids: List[str] = []
+    # invoice_payments가 없으면 invoices 단계에서 ID를 모을 필요가 없다
+    collect_invoice_ids = "invoices" in resources and "invoice_payments" in resources
+    invoice_ids: Optional[Dict[str, None]] = {} if collect_invoice_ids else None
     counts: Dict[str, int] = {}
     all_errors: List[str] = []
 
@@ -207,6 +313,7 @@ def main() -> None:
                 per_page=args.per_page,
                 since=since,
                 invoice_ids=invoice_ids,
+                concurrency=args.concurrency,
             )
             counts[resource] = count
             all_errors.extend(errors)
@@ -225,8 +332,8 @@ def main() -> None:
     }
 
     summary_path = os.path.join(output_dir, "summary.json")
-    with open(summary_path, "w", encoding="utf-8") as f:
-        json.dump(summary, f, ensure_ascii=True, indent=2)
+    with open(summary_path, "wb") as f:
+        f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
 
     print("Export complete.")
     for resource, count in counts.items():
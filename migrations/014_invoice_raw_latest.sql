@@ -0,0 +1,29 @@
+-- Newest raw payload per invoice, served from an index instead of sorting all of invoice_raw
+ALTER TABLE invoice_raw ADD COLUMN IF NOT EXISTS effective_time TIMESTAMPTZ
+  GENERATED ALWAYS AS (COALESCE(last_modified_time, updated_time, created_time, ingested_at)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_invoice_raw_latest
+  ON invoice_raw (invoice_id, effective_time DESC, ingested_at DESC)
+  WHERE invoice_id IS NOT NULL AND invoice_id <> '';
+
+-- DISTINCT ON follows idx_invoice_raw_latest order, so no full sort is needed
+CREATE OR REPLACE VIEW invoice_raw_latest AS
+SELECT DISTINCT ON (invoice_id)
+  invoice_id,
+  raw_json,
+  created_time,
+  updated_time,
+  last_modified_time,
+  ingested_at,
+  effective_time
+FROM invoice_raw
+WHERE invoice_id IS NOT NULL AND invoice_id <> ''
+ORDER BY invoice_id, effective_time DESC, ingested_at DESC;
+
+-- The transform runs as zoho_ingest on Supabase (002_roles); skip where that role does not exist (docker)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'zoho_ingest') THEN
+        GRANT SELECT ON invoice_raw_latest TO zoho_ingest;
+    END IF;
+END $$;
@@ -0,0 +1,34 @@
+-- Lenient casts used by the SQL-side invoice transform (bad values become NULL instead of failing the statement)
+CREATE OR REPLACE FUNCTION zoho_try_numeric(value TEXT) RETURNS NUMERIC
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+  IF value IS NULL OR value !~ '^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$' THEN
+    RETURN NULL;
+  END IF;
+  -- the regex still lets through values that overflow numeric (e.g. '1e1000000')
+  RETURN value::numeric;
+EXCEPTION WHEN others THEN
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION zoho_try_date(value TEXT) RETURNS DATE
+LANGUAGE plpgsql STABLE AS $$
+BEGIN
+  IF value IS NULL OR value !~ '^\d{4}-\d{2}-\d{2}$' THEN
+    RETURN NULL;
+  END IF;
+  RETURN value::date;
+EXCEPTION WHEN others THEN
+  RETURN NULL;
+END;
+$$;
+
+-- The transform runs as zoho_ingest on Supabase (002_roles); skip where that role does not exist (docker)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'zoho_ingest') THEN
+        GRANT EXECUTE ON FUNCTION zoho_try_numeric(TEXT) TO zoho_ingest;
+        GRANT EXECUTE ON FUNCTION zoho_try_date(TEXT) TO zoho_ingest;
+    END IF;
+END $$;
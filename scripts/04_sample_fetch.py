@@ -1,19 +1,22 @@
 import argparse
-import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-import requests
+import orjson
 from dotenv import load_dotenv
 
-from zoho_auth import get_access_token
+from zoho_auth import CONFIG, get_access_token
+from zoho_http import SESSION
 
 load_dotenv()
 
+MAX_WORKERS = 8
+
 
 def require_env(name: str) -> str:
     value = os.getenv(name)
@@ -31,26 +34,21 @@ def resolve_id(arg_value: str, env_name: str) -> str:
     return value
 
 
-def fetch_and_save(url: str, org_id: str, access_token: str, output_path: Path) -> None:
-    headers = {
-        "Authorization": f"Zoho-oauthtoken {access_token}",
-        "X-com-zoho-invoice-organizationid": org_id,
-    }
-    response = requests.get(url, headers=headers, timeout=30)
+def fetch_and_save(url: str, output_path: Path) -> None:
+    response = SESSION.get(url, timeout=30)
     status_code = response.status_code
 
     try:
-        payload = response.json()
-    except ValueError as exc:
+        payload = orjson.loads(response.content)
+    except orjson.JSONDecodeError as exc:
         raise RuntimeError(f"Non-JSON response (status {status_code})") from exc
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as handle:
-        json.dump(payload, handle, ensure_ascii=False, indent=2)
-        handle.write("\n")
+    with output_path.open("wb") as handle:
+        handle.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+        handle.write(b"\n")
 
-    print(status_code)
-    print(str(output_path))
+    # 스레드 간 출력이 섞이지 않도록 한 번에 출력
+    print(f"{status_code}\n{output_path}")
 
 
 def main() -> None:
@@ -60,9 +58,13 @@ def main() -> None:
     parser.add_argument("--item-id", default=None, help="Item ID (default: ZOHO_SAMPLE_ITEM_ID)")
     args = parser.parse_args()
 
-    api_domain = os.getenv("ZOHO_API_DOMAIN", "https://www.zohoapis.com").rstrip("/")
+    api_domain = CONFIG.api_domain
     org_id = require_env("ZOHO_ORG_ID")
     access_token = get_access_token()
+    SESSION.headers.update({
+        "Authorization": f"Zoho-oauthtoken {access_token}",
+        "X-com-zoho-invoice-organizationid": org_id,
+    })
 
     invoice_id = resolve_id(args.invoice_id, "ZOHO_SAMPLE_INVOICE_ID")
     contact_id = resolve_id(args.contact_id, "ZOHO_SAMPLE_CONTACT_ID")
@@ -70,26 +72,17 @@ def main() -> None:
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_dir = Path("data") / "samples" / timestamp
-
-    fetch_and_save(
-        f"{api_domain}/invoice/v3/invoices/{invoice_id}",
-        org_id,
-        access_token,
-        base_dir / "invoice.json",
-    )
-    fetch_and_save(
-        f"{api_domain}/invoice/v3/contacts/{contact_id}",
-        org_id,
-        access_token,
-        base_dir / "contact.json",
-    )
-    fetch_and_save(
-        f"{api_domain}/invoice/v3/items/{item_id}",
-        org_id,
-        access_token,
-        base_dir / "item.json",
-    )
-
+    base_dir.mkdir(parents=True, exist_ok=True)
+
+    targets = [
+        (f"{api_domain}/invoice/v3/invoices/{invoice_id}", base_dir / "invoice.json"),
+        (f"{api_domain}/invoice/v3/contacts/{contact_id}", base_dir / "contact.json"),
+        (f"{api_domain}/invoice/v3/items/{item_id}", base_dir / "item.json"),
+    ]
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(targets))) as executor:
+        futures = [executor.submit(fetch_and_save, url, path) for url, path in targets]
+        for future in as_completed(futures):
+            future.result()
 
 if __name__ == "__main__":
     main()
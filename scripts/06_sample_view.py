@@ -1,13 +1,20 @@
 import argparse
-import csv
 import json
 import re
 import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts._columnar import PARQUET_AVAILABLE, PYARROW_MISSING, write_csv, write_parquet
+from scripts._pathutil import TIMESTAMP_DIR_RE
+from scripts._tableutil import build_table
+
 SENSITIVE_KEY_RE = re.compile(r"(token|secret|refresh|access)", re.IGNORECASE)
-TIMESTAMP_DIR_RE = re.compile(r"^\d{8}_\d{6}$")
 
 HIGHLIGHT_FIELDS = {
     "invoice": ["invoice_id", "invoice_number", "status", "date", "total", "balance"],
@@ -79,46 +86,65 @@ BODY_KEY_CANDIDATES = [
     "purchaseorders",
     "bills",
 ]
+BODY_KEY_PRIORITY = {key: rank for rank, key in enumerate(BODY_KEY_CANDIDATES)}
 
 
+# JSON 필드 이름 종류는 적으므로 키별 판정 결과를 캐시한다
+@lru_cache(maxsize=4096)
 def is_sensitive_key(key: str) -> bool:
     return bool(SENSITIVE_KEY_RE.search(key))
 
 
 def mask_payload(value: Any) -> Any:
-    if isinstance(value, dict):
-        masked: Dict[str, Any] = {}
+    # 민감한 키가 없는 하위 트리는 복사하지 않고 원본 참조를 그대로 돌려준다
+    if type(value) is dict:
+        masked: Optional[Dict[str, Any]] = None
         for key, val in value.items():
-            if is_sensitive_key(key):
-                masked[key] = "***"
-            else:
-                masked[key] = mask_payload(val)
-        return masked
-    if isinstance(value, list):
-        return [mask_payload(item) for item in value]
+            new_val = "***" if is_sensitive_key(key) else mask_payload(val)
+            if new_val is not val:
+                if masked is None:
+                    masked = dict(value)
+                masked[key] = new_val
+        return value if masked is None else masked
+    if type(value) is list:
+        masked_items: Optional[List[Any]] = None
+        for idx, item in enumerate(value):
+            new_item = mask_payload(item)
+            if new_item is not item:
+                if masked_items is None:
+                    masked_items = list(value)
+                masked_items[idx] = new_item
+        return value if masked_items is None else masked_items
     return value
 
 
+def mask_field(key: str, value: Any) -> Any:
+    return "***" if is_sensitive_key(key) else mask_payload(value)
+
+
 def load_json(path: Path) -> Any:
-    with path.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return orjson.loads(path.read_bytes())
 
 
 def find_latest_sample_dir(base_dir: Path) -> Optional[Path]:
     if not base_dir.exists():
         return None
-    dirs = [p for p in base_dir.iterdir() if p.is_dir() and TIMESTAMP_DIR_RE.match(p.name)]
-    if not dirs:
-        return None
-    return sorted(dirs, key=lambda p: p.name)[-1]
+    dirs = (p for p in base_dir.iterdir() if TIMESTAMP_DIR_RE.match(p.name) and p.is_dir())
+    return max(dirs, key=lambda p: p.name, default=None)
 
 
 def detect_body_key(payload: Any) -> Optional[str]:
     if not isinstance(payload, dict):
         return None
-    for key in BODY_KEY_CANDIDATES:
-        if key in payload:
-            return key
+    # 페이로드 최상위 키(보통 1~5개)만 한 번 훑어 우선순위가 가장 높은 후보를 고른다
+    best_key = None
+    best_rank = len(BODY_KEY_PRIORITY)
+    for key in payload:
+        rank = BODY_KEY_PRIORITY.get(key, best_rank)
+        if rank < best_rank:
+            best_key, best_rank = key, rank
+    if best_key is not None:
+        return best_key
     if len(payload) == 1:
         return next(iter(payload.keys()))
     return None
@@ -129,39 +155,15 @@ def trim_list(items: Iterable[str], limit: int) -> List[str]:
 
 
 def summarize_list_field(name: str, value: Any) -> Optional[Tuple[str, int, List[str]]]:
-    if not isinstance(value, list):
+    if type(value) is not list:
         return None
     length = len(value)
     keys: List[str] = []
-    if length > 0 and isinstance(value[0], dict):
+    if length > 0 and type(value[0]) is dict:
         keys = list(value[0].keys())
     return name, length, keys
 
 
-def build_table(rows: List[Dict[str, Any]], columns: List[str], max_rows: int = 20) -> str:
-    usable_rows = rows[:max_rows]
-    rendered_rows = []
-    widths = [len(col) for col in columns]
-    for row in usable_rows:
-        rendered = []
-        for idx, col in enumerate(columns):
-            value = row.get(col, "")
-            text = str(value)
-            if len(text) > 30:
-                text = text[:27] + "..."
-            widths[idx] = max(widths[idx], len(text))
-            rendered.append(text)
-        rendered_rows.append(rendered)
-
-    header = " | ".join(col.ljust(widths[idx]) for idx, col in enumerate(columns))
-    divider = "-+-".join("-" * widths[idx] for idx in range(len(columns)))
-    lines = [header, divider]
-    for rendered in rendered_rows:
-        line = " | ".join(rendered[idx].ljust(widths[idx]) for idx in range(len(columns)))
-        lines.append(line)
-    return "\n".join(lines)
-
-
 def safe_value(value: Any) -> Any:
     return mask_payload(value)
 
@@ -185,7 +187,7 @@ def extract_entity_list(payload: Any, list_key: str, detail_key: str) -> List[Di
     return []
 
 
-def export_csvs(sample_dir: Path, payloads: Dict[str, Any]) -> Path:
+def export_csvs(sample_dir: Path, payloads: Dict[str, Any], parquet: bool = False) -> Path:
     out_dir = sample_dir / "out"
     out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -199,30 +201,37 @@ def export_csvs(sample_dir: Path, payloads: Dict[str, Any]) -> Path:
     if not items:
         items = extract_entity_list(payloads.get("item.json"), "items", "item")
 
-    line_items = []
-    for invoice in invoices:
-        for item in invoice.get("line_items", []) if isinstance(invoice, dict) else []:
-            if isinstance(item, dict):
-                row = {"invoice_id": invoice.get("invoice_id")}
-                row.update(item)
-                line_items.append(row)
-
     csv_data = {
-        "invoices.csv": invoices,
-        "contacts.csv": contacts,
-        "items.csv": items,
-        "invoice_line_items.csv": line_items,
+        filename: [tuple(safe_value(row.get(col)) for col in CSV_SCHEMAS[filename]) for row in rows]
+        for filename, rows in (
+            ("invoices.csv", invoices),
+            ("contacts.csv", contacts),
+            ("items.csv", items),
+        )
     }
 
-    for filename, rows in csv_data.items():
-        columns = CSV_SCHEMAS[filename]
+    # 라인 아이템은 중간 dict 없이 CSV 컬럼 순서의 튜플로 바로 만든다
+    line_item_columns = CSV_SCHEMAS["invoice_line_items.csv"]
+    line_item_rows = []
+    for invoice in invoices:
+        for item in invoice.get("line_items", []) if isinstance(invoice, dict) else []:
+            if isinstance(item, dict):
+                # 품목에 invoice_id가 있으면 그 값이 우선 (기존 dict.update 동작과 동일)
+                invoice_id = item["invoice_id"] if "invoice_id" in item else invoice.get("invoice_id")
+                line_item_rows.append(
+                    tuple(
+                        safe_value(invoice_id if col == "invoice_id" else item.get(col))
+                        for col in line_item_columns
+                    )
+                )
+    csv_data["invoice_line_items.csv"] = line_item_rows
+
+    for filename, masked_rows in csv_data.items():
+        columns = tuple(CSV_SCHEMAS[filename])
         path = out_dir / filename
-        with path.open("w", newline="", encoding="utf-8") as handle:
-            writer = csv.DictWriter(handle, fieldnames=columns)
-            writer.writeheader()
-            for row in rows:
-                masked_row = {col: safe_value(row.get(col)) for col in columns}
-                writer.writerow(masked_row)
+        write_csv(columns, masked_rows, path)
+        if parquet:
+            write_parquet(columns, masked_rows, path.with_suffix(".parquet"))
 
     return out_dir
 
@@ -257,9 +266,10 @@ def render_join_table(payloads: Dict[str, Any]) -> None:
     print("")
 
 
-def summarize_file(path: Path, include_table: bool) -> Dict[str, Any]:
-    raw_payload = load_json(path)
-    payload = mask_payload(raw_payload)
+def summarize_file(path: Path, include_table: bool, payload: Any = None) -> Dict[str, Any]:
+    # 페이로드 전체를 마스킹 복사하지 않고, 요약에 실제로 들어가는 값만 마스킹한다
+    if payload is None:
+        payload = load_json(path)
 
     summary: Dict[str, Any] = {
         "file": str(path),
@@ -269,13 +279,17 @@ def summarize_file(path: Path, include_table: bool) -> Dict[str, Any]:
     body_key = detect_body_key(payload)
     summary["body_key"] = body_key
 
-    body = payload.get(body_key) if body_key and isinstance(payload, dict) else None
+    body = None
+    if body_key and isinstance(payload, dict):
+        body = "***" if is_sensitive_key(body_key) else payload.get(body_key)
     summary["body_type"] = type(body).__name__ if body is not None else None
 
     if isinstance(body, dict):
         summary["body_keys"] = trim_list(body.keys(), 40)
         list_fields = []
         for key, value in body.items():
+            if is_sensitive_key(key):
+                continue
             info = summarize_list_field(key, value)
             if info:
                 list_fields.append(info)
@@ -289,7 +303,7 @@ def summarize_file(path: Path, include_table: bool) -> Dict[str, Any]:
         if entity_type in HIGHLIGHT_FIELDS:
             for field in HIGHLIGHT_FIELDS[entity_type]:
                 if field in body:
-                    highlights[field] = body.get(field)
+                    highlights[field] = mask_field(field, body.get(field))
         summary["highlights"] = highlights
     elif isinstance(body, list):
         summary["list_length"] = len(body)
@@ -297,7 +311,7 @@ def summarize_file(path: Path, include_table: bool) -> Dict[str, Any]:
             summary["list_item_keys"] = list(body[0].keys())
         if include_table and body_key in TABLE_COLUMNS:
             summary["table_columns"] = TABLE_COLUMNS[body_key]
-            summary["table_rows"] = body[:20]
+            summary["table_rows"] = mask_payload(body[:20])
     else:
         summary["body_keys"] = []
         summary["highlights"] = {}
@@ -348,7 +362,10 @@ def main() -> None:
     parser.add_argument("--table", action="store_true", help="Render tables for list bodies")
     parser.add_argument("--csv", action="store_true", help="Export CSV files to sample out/ folder")
     parser.add_argument("--join-table", action="store_true", help="Render invoice join table")
+    parser.add_argument("--parquet", action="store_true", help="Also write Parquet next to the CSV export")
     args = parser.parse_args()
+    if args.parquet and not PARQUET_AVAILABLE:
+        parser.error(PYARROW_MISSING)
 
     base_dir = Path("data") / "samples"
     sample_dir = Path(args.sample_dir) if args.sample_dir else find_latest_sample_dir(base_dir)
@@ -363,7 +380,8 @@ def main() -> None:
         sys.exit(1)
 
     payloads = read_payloads(sample_dir)
-    summaries = [summarize_file(path, args.table) for path in files]
+    # read_payloads에서 파싱한 결과를 요약에도 재사용 (파일당 한 번만 파싱)
+    summaries = [summarize_file(path, args.table, payloads[path.name]) for path in files]
 
     if args.json:
         output = {
@@ -379,8 +397,8 @@ def main() -> None:
     if args.join_table:
         render_join_table(payloads)
 
-    if args.csv:
-        out_dir = export_csvs(sample_dir, payloads)
+    if args.csv or args.parquet:
+        out_dir = export_csvs(sample_dir, payloads, parquet=args.parquet)
         print(f"CSV export: {out_dir}")
         print("")
     for summary in summaries:
@@ -1,13 +1,17 @@
 import argparse
-import csv
-import json
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, Tuple
 from zoneinfo import ZoneInfo
 
-TIMESTAMP_DIR_RE = r"^\d{8}_\d{6}$"
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts._columnar import PARQUET_AVAILABLE, PYARROW_MISSING, write_csv, write_parquet
+from scripts._pathutil import find_latest_invoices_jsonl
+from scripts._tableutil import build_table
 
 CSV_COLUMNS = [
     "invoice_id",
@@ -41,94 +45,49 @@ def current_month_seoul() -> str:
     return now.strftime("%Y-%m")
 
 
-def find_latest_invoices_jsonl(base_dir: Path) -> Optional[Path]:
-    if not base_dir.exists():
-        return None
-    candidates = []
-    for path in base_dir.iterdir():
-        if path.is_dir() and path.name and path.name[0].isdigit():
-            invoices_path = path / "invoices.jsonl"
-            if invoices_path.exists():
-                candidates.append(invoices_path)
-    if not candidates:
-        return None
-    return sorted(candidates, key=lambda p: p.parent.name)[-1]
-
-
 def read_jsonl(path: Path) -> Iterable[Dict[str, object]]:
-    with path.open("r", encoding="utf-8") as handle:
+    with path.open("rb") as handle:
         for line in handle:
-            line = line.strip()
-            if not line:
+            if line.isspace():
                 continue
             try:
-                payload = json.loads(line)
-            except json.JSONDecodeError:
+                payload = orjson.loads(line)
+            except orjson.JSONDecodeError:
                 continue
-            if isinstance(payload, dict):
+            if type(payload) is dict:
                 yield payload
 
 
-def filter_invoices(invoices: Iterable[Dict[str, object]], month_prefix: str) -> List[Dict[str, object]]:
+def collect_month(
+    invoices: Iterable[Dict[str, object]], month_prefix: str
+) -> Tuple[List[Dict[str, object]], float, float]:
+    # 필터, line_items_count 계산, 합계를 한 번의 순회로 처리
     filtered = []
+    total_sum = 0.0
+    balance_sum = 0.0
     for invoice in invoices:
         date_value = invoice.get("date")
-        if isinstance(date_value, str) and date_value.startswith(month_prefix):
-            filtered.append(invoice)
-    return filtered
-
-
-def sum_amount(values: Iterable[Dict[str, object]], key: str) -> float:
-    total = 0.0
-    for item in values:
-        value = item.get(key)
-        if isinstance(value, (int, float)):
-            total += float(value)
-    return total
-
-
-def build_table(rows: List[Dict[str, object]], columns: List[str], max_rows: int) -> str:
-    widths = [len(col) for col in columns]
-    rendered_rows = []
-    for row in rows[:max_rows]:
-        rendered = []
-        for idx, col in enumerate(columns):
-            value = row.get(col, "")
-            text = str(value)
-            if len(text) > 30:
-                text = text[:27] + "..."
-            widths[idx] = max(widths[idx], len(text))
-            rendered.append(text)
-        rendered_rows.append(rendered)
-
-    header = " | ".join(col.ljust(widths[idx]) for idx, col in enumerate(columns))
-    divider = "-+-".join("-" * widths[idx] for idx in range(len(columns)))
-    lines = [header, divider]
-    for rendered in rendered_rows:
-        line = " | ".join(rendered[idx].ljust(widths[idx]) for idx in range(len(columns)))
-        lines.append(line)
-    return "\n".join(lines)
-
-
-def export_csv(rows: List[Dict[str, object]], out_path: Path) -> None:
+        if not isinstance(date_value, str) or not date_value.startswith(month_prefix):
+            continue
+        line_items = invoice.get("line_items")
+        # read_jsonl이 줄마다 새 dict를 만들므로 복사 없이 필드를 추가해도 된다
+        invoice["line_items_count"] = len(line_items) if type(line_items) is list else 0
+        total = invoice.get("total")
+        if isinstance(total, (int, float)):
+            total_sum += float(total)
+        balance = invoice.get("balance")
+        if isinstance(balance, (int, float)):
+            balance_sum += float(balance)
+        filtered.append(invoice)
+    return filtered, total_sum, balance_sum
+
+
+def export_csv(rows: List[Dict[str, object]], out_path: Path, parquet: bool = False) -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=CSV_COLUMNS)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({col: row.get(col) for col in CSV_COLUMNS})
-
-
-def normalize_invoice(invoice: Dict[str, object]) -> Dict[str, object]:
-    line_items = invoice.get("line_items")
-    if isinstance(line_items, list):
-        line_items_count = len(line_items)
-    else:
-        line_items_count = 0
-
-    normalized = dict(invoice)
-    normalized["line_items_count"] = line_items_count
-    return normalized
+    values = [tuple(row.get(col) for col in CSV_COLUMNS) for row in rows]
+    write_csv(CSV_COLUMNS, values, out_path)
+    if parquet:
+        write_parquet(CSV_COLUMNS, values, out_path.with_suffix(".parquet"))
 
 
 def main() -> None:
@@ -137,7 +96,10 @@ def main() -> None:
     parser.add_argument("--src", default=None, help="Path to invoices.jsonl")
     parser.add_argument("--limit", type=int, default=30, help="Max rows to display")
     parser.add_argument("--outdir", default=None, help="Custom output directory")
+    parser.add_argument("--parquet", action="store_true", help="Also write Parquet next to the CSV")
     args = parser.parse_args()
+    if args.parquet and not PARQUET_AVAILABLE:
+        parser.error(PYARROW_MISSING)
 
     month_value = args.month or current_month_seoul()
     try:
@@ -155,11 +117,8 @@ def main() -> None:
         )
         sys.exit(1)
 
-    invoices = list(read_jsonl(src_path))
-    filtered = [normalize_invoice(inv) for inv in filter_invoices(invoices, month_prefix)]
-
-    total_sum = sum_amount(filtered, "total")
-    balance_sum = sum_amount(filtered, "balance")
+    # 파일 전체를 메모리에 올리지 않고 해당 월 인보이스만 모은다
+    filtered, total_sum, balance_sum = collect_month(read_jsonl(src_path), month_prefix)
 
     month_label = month_prefix.replace("-", "_")
     if args.outdir:
@@ -185,7 +144,7 @@ def main() -> None:
         "line_items_count",
     ]
     print(build_table(filtered, table_columns, args.limit))
-    export_csv(filtered, out_path)
+    export_csv(filtered, out_path, parquet=args.parquet)
 
 
 if __name__ == "__main__":
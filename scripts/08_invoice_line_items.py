@@ -1,40 +1,51 @@
 import argparse
-import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+import orjson
+
+from scripts._columnar import PARQUET_AVAILABLE, PYARROW_MISSING, write_parquet
+from scripts._pathutil import find_latest_invoices_jsonl
 from zoho_client import ZohoClient
 
-
-def find_latest_invoices_jsonl(base_dir: Path) -> Optional[Path]:
-    if not base_dir.exists():
-        return None
-    candidates = []
-    for path in base_dir.iterdir():
-        if path.is_dir() and path.name and path.name[0].isdigit():
-            invoices_path = path / "invoices.jsonl"
-            if invoices_path.exists():
-                candidates.append(invoices_path)
-    if not candidates:
-        return None
-    return sorted(candidates, key=lambda p: p.parent.name)[-1]
+# JSONL 쓰기 버퍼 크기 (작은 write syscall 방지)
+WRITE_BUFFER_SIZE = 1 << 20
+# 인보이스 상세 조회 동시 실행 수 (세션 풀 크기 20 이내로 유지)
+DETAIL_WORKERS = 16
+DETAIL_WORKERS_MAX = 20
+
+# --parquet 출력에 쓰는 라인 아이템 컬럼 (JSONL은 전체 필드를 유지)
+LINE_ITEM_COLUMNS = (
+    "invoice_id",
+    "invoice_number",
+    "customer_id",
+    "customer_name",
+    "line_item_id",
+    "item_id",
+    "name",
+    "description",
+    "unit",
+    "quantity",
+    "rate",
+    "item_total",
+)
 
 
 def read_invoice_ids(path: Path) -> List[str]:
     invoice_ids = []
-    with path.open("r", encoding="utf-8") as handle:
+    with path.open("rb") as handle:
         for line in handle:
-            line = line.strip()
-            if not line:
+            if line.isspace():
                 continue
             try:
-                payload = json.loads(line)
-            except json.JSONDecodeError:
+                payload = orjson.loads(line)
+            except orjson.JSONDecodeError:
                 continue
-            if isinstance(payload, dict):
+            if type(payload) is dict:
                 invoice_id = payload.get("invoice_id")
                 if invoice_id:
                     invoice_ids.append(str(invoice_id))
@@ -43,10 +54,9 @@ def read_invoice_ids(path: Path) -> List[str]:
 
 def write_jsonl(path: Path, records: Iterable[Dict[str, object]]) -> int:
     count = 0
-    with path.open("w", encoding="utf-8") as handle:
+    with path.open("wb", buffering=WRITE_BUFFER_SIZE) as handle:
         for record in records:
-            handle.write(json.dumps(record, ensure_ascii=True))
-            handle.write("\n")
+            handle.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
             count += 1
     return count
 
@@ -59,27 +69,32 @@ def export_list_resource(
     per_page: int,
 ) -> int:
     total = 0
-    with out_path.open("w", encoding="utf-8") as handle:
+    with out_path.open("wb", buffering=WRITE_BUFFER_SIZE) as handle:
         for _, items in client.get_paginated(path, params=None, list_key=list_key, per_page=per_page):
             for item in items:
-                handle.write(json.dumps(item, ensure_ascii=True))
-                handle.write("\n")
+                handle.write(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE))
                 total += 1
     return total
 
 
+def fetch_invoice_detail(client: ZohoClient, invoice_id: str) -> Optional[Dict[str, object]]:
+    try:
+        payload = client.request("GET", f"/invoice/v3/invoices/{invoice_id}")
+    except RuntimeError:
+        print(f"Failed invoice {invoice_id}", file=sys.stderr)
+        return None
+    invoice = payload.get("invoice")
+    return invoice if isinstance(invoice, dict) else None
+
+
 def fetch_invoice_details(
-    client: ZohoClient, invoice_ids: List[str]
+    client: ZohoClient, invoice_ids: List[str], concurrency: int = DETAIL_WORKERS
 ) -> Iterable[Dict[str, object]]:
-    for invoice_id in invoice_ids:
-        try:
-            payload = client.request("GET", f"/invoice/v3/invoices/{invoice_id}")
-        except RuntimeError:
-            print(f"Failed invoice {invoice_id}", file=sys.stderr)
-            continue
-        invoice = payload.get("invoice")
-        if isinstance(invoice, dict):
-            yield invoice
+    # 상세 조회는 워커가 병렬로, 결과는 invoice_ids 순서대로 내보낸다 (429/5xx 재시도는 세션이 처리)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for invoice in executor.map(lambda invoice_id: fetch_invoice_detail(client, invoice_id), invoice_ids):
+            if invoice is not None:
+                yield invoice
 
 
 def flatten_line_items(invoice: Dict[str, object]) -> Iterable[Dict[str, object]]:
@@ -90,11 +105,11 @@ def flatten_line_items(invoice: Dict[str, object]) -> Iterable[Dict[str, object]
         "customer_name": invoice.get("customer_name"),
     }
     line_items = invoice.get("line_items")
-    if not isinstance(line_items, list):
+    if type(line_items) is not list:
         return []
     rows = []
     for item in line_items:
-        if not isinstance(item, dict):
+        if type(item) is not dict:
             continue
         row = dict(base)
         row.update(item)
@@ -112,7 +127,20 @@ def main() -> None:
     parser.add_argument("--max-invoices", type=int, default=None, help="Limit invoice detail fetch")
     parser.add_argument("--skip-contacts", action="store_true", help="Skip contacts export")
     parser.add_argument("--skip-items", action="store_true", help="Skip items export")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DETAIL_WORKERS,
+        help=f"Parallel invoice detail fetches (default {DETAIL_WORKERS}, 1..{DETAIL_WORKERS_MAX}).",
+    )
+    parser.add_argument(
+        "--parquet", action="store_true", help="Also write invoice_line_items.parquet"
+    )
     args = parser.parse_args()
+    if args.parquet and not PARQUET_AVAILABLE:
+        parser.error(PYARROW_MISSING)
+    if not 1 <= args.concurrency <= DETAIL_WORKERS_MAX:
+        parser.error(f"--concurrency must be between 1 and {DETAIL_WORKERS_MAX}")
 
     base_dir = Path("data") / "raw"
     src_path = Path(args.src) if args.src else find_latest_invoices_jsonl(base_dir)
@@ -141,13 +169,17 @@ def main() -> None:
 
     invoice_detail_count = 0
     line_items_count = 0
-    with line_items_path.open("w", encoding="utf-8") as handle:
-        for invoice in fetch_invoice_details(client, invoice_ids):
+    parquet_rows = []
+    with line_items_path.open("wb", buffering=WRITE_BUFFER_SIZE) as handle:
+        for invoice in fetch_invoice_details(client, invoice_ids, args.concurrency):
             invoice_detail_count += 1
             for row in flatten_line_items(invoice):
-                handle.write(json.dumps(row, ensure_ascii=True))
-                handle.write("\n")
+                handle.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
                 line_items_count += 1
+                if args.parquet:
+                    parquet_rows.append(tuple(row.get(col) for col in LINE_ITEM_COLUMNS))
+    if args.parquet:
+        write_parquet(LINE_ITEM_COLUMNS, parquet_rows, line_items_path.with_suffix(".parquet"))
 
     contacts_count = 0
     items_count = 0
@@ -162,6 +194,8 @@ def main() -> None:
 
     print(f"invoice_details: {invoice_detail_count}")
     print(f"invoice_line_items: {line_items_count} -> {line_items_path}")
+    if args.parquet:
+        print(f"invoice_line_items (parquet): {line_items_path.with_suffix('.parquet')}")
     if not args.skip_contacts:
         print(f"contacts: {contacts_count} -> {contacts_path}")
     if not args.skip_items:
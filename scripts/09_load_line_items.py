@@ -2,10 +2,8 @@
 and upsert them into the invoice_line_items table."""
 
 import argparse
-import json
 import os
 import sys
-from decimal import Decimal
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -16,7 +14,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import psycopg
-from psycopg.types.json import Json
+
+from scripts._dbpool import J, parse_decimal
 
 from zoho_client import ZohoClient
 
@@ -49,51 +48,6 @@ def build_conn() -> psycopg.Connection:
     )
 
 
-def execute_values(cur, sql, argslist, template=None, page_size=500) -> None:
-    if not argslist:
-        return
-    if sql.count("%s") != 1:
-        raise ValueError("execute_values expects a single %s placeholder in SQL")
-
-    value_template = template or "(" + ",".join(["%s"] * len(argslist[0])) + ")"
-    chunks = [argslist[i : i + page_size] for i in range(0, len(argslist), page_size)]
-
-    for chunk in chunks:
-        placeholders = ",".join([value_template] * len(chunk))
-        query = sql.replace("%s", placeholders)
-        flattened = []
-        for row in chunk:
-            flattened.extend(row)
-        cur.execute(query, flattened)
-
-
-# ---------------------------------------------------------------------------
-# JSON / Decimal helpers
-# ---------------------------------------------------------------------------
-
-def json_dumps_default(obj) -> str:
-    return json.dumps(obj, default=str, ensure_ascii=False)
-
-
-def J(obj) -> Json:
-    return Json(obj, dumps=json_dumps_default)
-
-
-def parse_decimal(value: Any) -> Optional[Decimal]:
-    if value is None:
-        return None
-    if isinstance(value, Decimal):
-        return value
-    if isinstance(value, (int, float)):
-        return Decimal(str(value))
-    if isinstance(value, str):
-        try:
-            return Decimal(value)
-        except Exception:
-            return None
-    return None
-
-
 # ---------------------------------------------------------------------------
 # Query: paid invoices without line items
 # ---------------------------------------------------------------------------
@@ -207,7 +161,7 @@ def upsert_line_items(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             unit,
             hsn_or_sac,
             raw_json
-        ) VALUES %s
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (line_item_id) DO UPDATE SET
             invoice_id     = EXCLUDED.invoice_id,
             name           = EXCLUDED.name,
@@ -224,7 +178,7 @@ def upsert_line_items(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             raw_json       = EXCLUDED.raw_json
     """
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows)
+        cur.executemany(sql, rows)
     conn.commit()
 
 
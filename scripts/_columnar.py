@@ -0,0 +1,91 @@
+"""CSV and optional Parquet output for the export scripts (Parquet requires pyarrow)."""
+
+import csv
+from pathlib import Path
+from typing import Any, Iterable, List, Sequence
+
+import orjson
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 100k행 단위 row group (대략 수십 MB, 컬럼 pushdown에 적당한 크기)
+PARQUET_ROW_GROUP_SIZE = 100_000
+
+FLOAT_COLUMNS = frozenset({"total", "balance", "rate", "quantity", "item_total", "sales_rate"})
+INT_COLUMNS = frozenset({"line_items_count"})
+
+PARQUET_AVAILABLE = pa is not None
+PYARROW_MISSING = "--parquet requires pyarrow: pip install pyarrow"
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError(PYARROW_MISSING)
+
+
+def _column_type(name: str):
+    if name in FLOAT_COLUMNS:
+        return pa.float64()
+    if name in INT_COLUMNS:
+        return pa.int64()
+    return pa.string()
+
+
+def _to_float(value: Any) -> Any:
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: Any) -> Any:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def _to_str(value: Any) -> Any:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode("utf-8")
+    return str(value)
+
+
+def write_parquet(columns: Sequence[str], rows: Iterable[Sequence[Any]], out_path: Path) -> Path:
+    """Write rows (tuples in `columns` order) to a Snappy-compressed Parquet file."""
+    require_pyarrow()
+    converters = [
+        _to_float if col in FLOAT_COLUMNS else _to_int if col in INT_COLUMNS else _to_str
+        for col in columns
+    ]
+    values: List[List[Any]] = [[] for _ in columns]
+    for row in rows:
+        for idx, value in enumerate(row):
+            values[idx].append(converters[idx](value))
+
+    schema = pa.schema([(col, _column_type(col)) for col in columns])
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(values, schema)],
+        schema=schema,
+    )
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, str(out_path), compression="snappy", row_group_size=PARQUET_ROW_GROUP_SIZE)
+    return out_path
+
+
+def write_csv(columns: Sequence[str], rows: Iterable[Sequence[Any]], out_path: Path) -> Path:
+    """Write rows (tuples in `columns` order) as CSV with csv.writer."""
+    # pyarrow 설치 여부와 상관없이 같은 바이트가 나오도록 CSV는 항상 csv 모듈로 쓴다
+    with out_path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return out_path
@@ -0,0 +1,148 @@
+"""Postgres connection settings and pooled, parallel batch upserts for the load/transform scripts."""
+
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TypeVar
+
+import orjson
+import psycopg
+from psycopg.types.json import Jsonb, set_json_dumps, set_json_loads
+from psycopg_pool import ConnectionPool
+
+T = TypeVar("T")
+
+# 기본 병렬 연결 수 (Supabase는 RTT가 지배적이라 연결 수만큼 처리량이 늘어난다)
+DB_WORKERS = 4
+
+# executemany upsert 기본 배치 크기. 500행은 Supabase 왕복 비용을 다 가리지 못하고,
+# 2000행 부근부터 처리량 곡선이 평평해진다 (raw 적재는 COPY라 5000행 유지)
+UPSERT_BATCH_SIZE = 2000
+
+# 대량 적재 세션은 커밋마다 WAL fsync를 기다리지 않는다.
+# 서버가 죽으면 마지막 몇 커밋이 사라질 수 있지만 ON CONFLICT upsert라 다시 돌리면 된다
+BULK_SESSION_SQL = "SET synchronous_commit = off"
+
+REQUIRED_ENV = ("PGHOST", "PGPORT", "PGDATABASE", "PGUSER", "PGPASSWORD")
+
+# 기존 json.dumps(default=str)와 같은 값을 내도록 datetime/Decimal 등은 str()로 넘긴다
+JSON_DUMPS_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def json_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=str, option=JSON_DUMPS_OPTIONS)
+
+
+# 이 모듈을 쓰는 스크립트의 JSON/JSONB 입출력은 모두 orjson으로 처리
+set_json_dumps(json_dumps)
+set_json_loads(orjson.loads)
+
+
+def J(obj) -> Jsonb:
+    return Jsonb(obj, dumps=json_dumps)
+
+
+def parse_decimal(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return _parse_decimal_str(str(value))
+    if isinstance(value, str):
+        return _parse_decimal_str(value)
+    return None
+
+
+@lru_cache(maxsize=16384)
+def _parse_decimal_str(text: str) -> Optional[Decimal]:
+    # 금액/수량 값은 인보이스마다 반복되므로 Decimal 생성 결과를 캐시 (Decimal은 불변)
+    try:
+        return Decimal(text)
+    except Exception:
+        return None
+
+
+def conn_kwargs() -> Dict[str, Any]:
+    missing = [name for name in REQUIRED_ENV if not os.getenv(name)]
+    if missing:
+        missing_list = ", ".join(missing)
+        print(
+            f"Missing env vars: {missing_list}. Required for Supabase/Postgres connection.",
+            file=sys.stderr,
+        )
+        print("Set PGSSLMODE=require for Supabase.", file=sys.stderr)
+        sys.exit(1)
+
+    return {
+        "host": os.getenv("PGHOST"),
+        "port": os.getenv("PGPORT"),
+        "dbname": os.getenv("PGDATABASE"),
+        "user": os.getenv("PGUSER"),
+        "password": os.getenv("PGPASSWORD"),
+        "sslmode": os.getenv("PGSSLMODE", "require"),
+    }
+
+
+def configure_bulk_session(conn: psycopg.Connection) -> None:
+    conn.execute(BULK_SESSION_SQL)
+    conn.commit()
+
+
+def build_bulk_conn() -> psycopg.Connection:
+    conn = psycopg.connect(**conn_kwargs())
+    configure_bulk_session(conn)
+    return conn
+
+
+def build_pool(workers: int = DB_WORKERS) -> ConnectionPool:
+    return ConnectionPool(
+        kwargs=conn_kwargs(),
+        min_size=workers,
+        max_size=workers,
+        configure=configure_bulk_session,
+        open=True,
+    )
+
+
+def iter_batches(rows: Iterable[T], size: int) -> Iterator[List[T]]:
+    batch: List[T] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batches(
+    pool: ConnectionPool,
+    upsert: Callable[[psycopg.Connection, List[T]], None],
+    batches: Iterable[Sequence[T]],
+    workers: int = DB_WORKERS,
+    group: int = 1,
+) -> int:
+    """Run upsert(conn, batch) on pooled connections in parallel; each group of batches is one transaction."""
+
+    def run(chunk: List[Sequence[T]]) -> int:
+        # pool.connection()은 예외 없이 끝나면 커밋, 예외면 롤백한다
+        with pool.connection() as conn:
+            for batch in chunk:
+                upsert(conn, batch)
+        return sum(len(batch) for batch in chunk)
+
+    total = 0
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk in iter_batches(batches, max(group, 1)):
+            # 파싱이 업로드를 앞지르지 않도록 진행 중인 작업 수를 workers * 2로 제한
+            if len(pending) >= workers * 2:
+                total += pending.popleft().result()
+            pending.append(executor.submit(run, chunk))
+        while pending:
+            total += pending.popleft().result()
+    return total
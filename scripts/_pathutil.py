@@ -0,0 +1,25 @@
+"""Locating timestamped export folders under data/raw and data/samples."""
+
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+TIMESTAMP_DIR_RE = re.compile(r"^\d{8}_\d{6}$")
+
+
+def find_latest_invoices_jsonl(base_dir: Path) -> Optional[Path]:
+    if not base_dir.exists():
+        return None
+    # scandir의 DirEntry는 is_dir() 결과를 캐시하므로 항목마다 stat을 다시 호출하지 않는다
+    with os.scandir(base_dir) as entries:
+        candidates = [
+            Path(entry.path) / "invoices.jsonl"
+            for entry in entries
+            if entry.name[:1].isdigit() and entry.is_dir()
+        ]
+    return max(
+        (path for path in candidates if path.exists()),
+        key=lambda p: p.parent.name,
+        default=None,
+    )
@@ -0,0 +1,28 @@
+"""Plain-text table rendering shared by the sample/monthly viewer scripts."""
+
+from typing import Any, Dict, List, Sequence
+
+MAX_CELL_WIDTH = 30
+TRUNCATED_WIDTH = MAX_CELL_WIDTH - 3
+
+
+def build_table(rows: List[Dict[str, Any]], columns: Sequence[str], max_rows: int = 20) -> str:
+    widths = [len(col) for col in columns]
+    rendered_rows = []
+    for row in rows[:max_rows]:
+        rendered = []
+        for idx, col in enumerate(columns):
+            text = str(row.get(col, ""))
+            if len(text) > MAX_CELL_WIDTH:
+                text = text[:TRUNCATED_WIDTH] + "..."
+            if len(text) > widths[idx]:
+                widths[idx] = len(text)
+            rendered.append(text)
+        rendered_rows.append(rendered)
+
+    # 폭이 확정된 뒤 행 포맷 문자열을 한 번만 만든다
+    fmt = " | ".join(f"{{:<{width}}}" for width in widths)
+    divider = "-+-".join("-" * width for width in widths)
+    lines = [fmt.format(*columns), divider]
+    lines.extend(fmt.format(*rendered) for rendered in rendered_rows)
+    return "\n".join(lines)
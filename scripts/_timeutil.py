@@ -0,0 +1,60 @@
+"""Zoho timestamp/date parsing shared by the load and transform scripts (one process-wide cache)."""
+
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
+
+# 끝의 +HHMM / -HHMM 오프셋 (콜론 없는 Zoho 형식)
+_TZ_RE = re.compile(r"[+-]\d{2}(\d{2})$")
+
+# fromisoformat이 못 읽는 드문 형식만 여기로 온다
+_FALLBACK_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value or not isinstance(value, str):
+        return None
+    trimmed = value.strip()
+    if not trimmed:
+        return None
+    return _parse_timestamp_str(trimmed)
+
+
+@lru_cache(maxsize=65536)
+def _parse_timestamp_str(text: str) -> Optional[datetime]:
+    # 같은 타임스탬프 문자열이 행/필드마다 반복되므로 결과를 캐시 (datetime은 불변이라 공유해도 안전)
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    else:
+        match = _TZ_RE.search(text)
+        if match:
+            text = text[: match.start(1)] + ":" + text[match.start(1) :]
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in _FALLBACK_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    if not value or not isinstance(value, str):
+        return None
+    return _parse_date_str(value)
+
+
+@lru_cache(maxsize=65536)
+def _parse_date_str(value: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
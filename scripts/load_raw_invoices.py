@@ -1,186 +1,237 @@
 import argparse
-import json
+import mmap
+import multiprocessing
 import os
 import sys
-from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from typing import Iterable, List, Optional, Tuple
 
+import orjson
 import psycopg
-from psycopg.types.json import Json
+from psycopg.types.json import Jsonb
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts._dbpool import (
+    DB_WORKERS,
+    build_bulk_conn,
+    build_pool,
+    conn_kwargs,
+    iter_batches,
+    run_batches,
+)
+from scripts._timeutil import parse_timestamp
+
+# 병렬 적재 시 연결마다 이 배치 수만큼 모아 한 번에 커밋
+RAW_COMMIT_GROUP = 4
+
+# CLI 기본 파싱 프로세스 수 (--parse-workers). iter_records 자체의 기본값은 1(현재 프로세스)
+PARSE_WORKERS = os.cpu_count() or 1
+
+# 멀티프로세스 파싱 시 샤드 최대 크기 (작게 나눠 워커 간 부하를 고르게 하고 첫 결과를 빨리 받는다)
+# 이보다 작은 파일(sync.py의 15분 델타 등)은 프로세스 풀 없이 현재 프로세스에서 파싱
+SHARD_BYTES = 1 << 20
+
+RAW_COLUMNS = "source_file, line_no, invoice_id, raw_json, created_time, updated_time, last_modified_time"
+
+# upsert_batch가 배치마다 보내는 SQL (모듈 로드 시 한 번만 만든다)
+STAGE_CREATE_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS invoice_raw_stage "
+    "(LIKE invoice_raw INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+)
+STAGE_COPY_SQL = f"COPY invoice_raw_stage ({RAW_COLUMNS}) FROM STDIN"
+STAGE_UPSERT_SQL = f"""
+    INSERT INTO invoice_raw ({RAW_COLUMNS}, ingested_at)
+    SELECT {RAW_COLUMNS}, ingested_at FROM invoice_raw_stage
+    ON CONFLICT (source_file, line_no)
+    DO UPDATE SET
+        raw_json = EXCLUDED.raw_json,
+        created_time = EXCLUDED.created_time,
+        updated_time = EXCLUDED.updated_time,
+        last_modified_time = EXCLUDED.last_modified_time,
+        ingested_at = EXCLUDED.ingested_at
+"""
+STAGE_TRUNCATE_SQL = "TRUNCATE invoice_raw_stage"
 
 
 def build_conn() -> psycopg.Connection:
-    required = ["PGHOST", "PGPORT", "PGDATABASE", "PGUSER", "PGPASSWORD"]
-    missing = [name for name in required if not os.getenv(name)]
-    if missing:
-        missing_list = ", ".join(missing)
-        print(
-            f"Missing env vars: {missing_list}. Required for Supabase/Postgres connection.",
-            file=sys.stderr,
-        )
-        print("Set PGSSLMODE=require for Supabase.", file=sys.stderr)
-        sys.exit(1)
-
-    sslmode = os.getenv("PGSSLMODE", "require")
-
-    return psycopg.connect(
-        host=os.getenv("PGHOST"),
-        port=os.getenv("PGPORT"),
-        dbname=os.getenv("PGDATABASE"),
-        user=os.getenv("PGUSER"),
-        password=os.getenv("PGPASSWORD"),
-        sslmode=sslmode,
-    )
-
-
-def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
-    if not value or not isinstance(value, str):
-        return None
-    trimmed = value.strip()
-    if not trimmed:
-        return None
-
-    candidates = [trimmed]
-    if trimmed.endswith("Z"):
-        candidates.append(trimmed[:-1] + "+00:00")
-
-    if len(trimmed) >= 5 and trimmed[-5] in ["+", "-"]:
-        sign = trimmed[-5]
-        digits = trimmed[-4:]
-        if digits.isdigit():
-            candidates.append(trimmed + "00")
-            candidates.append(trimmed[:-5] + sign + digits[:2] + ":" + digits[2:])
-
-    if len(trimmed) >= 6 and trimmed[-6] in ["+", "-"] and trimmed[-3] == ":":
-        candidates.append(trimmed[:-6] + trimmed[-6:-3] + trimmed[-2:])
-
-    for candidate in candidates:
-        try:
-            return datetime.fromisoformat(candidate)
-        except ValueError:
-            pass
-        for fmt in (
-            "%Y-%m-%dT%H:%M:%S%z",
-            "%Y-%m-%d %H:%M:%S%z",
-            "%Y-%m-%dT%H:%M:%S.%f%z",
-        ):
+    return psycopg.connect(**conn_kwargs())
+
+
+def _shard_ranges(mm: mmap.mmap, shards: int) -> List[Tuple[int, int]]:
+    size = len(mm)
+    step = max(1, -(-size // shards))
+    ranges = []
+    start = 0
+    while start < size:
+        end = mm.find(b"\n", min(start + step, size) - 1)
+        end = size if end == -1 else end + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _parse_shard(
+    task: Tuple[str, int, int],
+) -> Tuple[int, List[Tuple], List[Tuple[int, str]]]:
+    """Parse one newline-aligned byte range; line numbers are relative to the range."""
+    path, start, end = task
+    rows: List[Tuple] = []
+    errors: List[Tuple[int, str]] = []
+    idx = 0
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            newline = mm.find(b"\n", pos, end)
+            line_end = end if newline == -1 else newline
+            line = mm[pos:line_end]
+            pos = line_end + 1
+            idx += 1
+            if not line or line.isspace():
+                continue
             try:
-                return datetime.strptime(candidate, fmt)
-            except ValueError:
+                payload = orjson.loads(line)
+            except orjson.JSONDecodeError as exc:
+                errors.append((idx, f"json error: {exc}"))
                 continue
-    return None
-
-
-def execute_values(cur, sql, argslist, template=None, page_size=1000) -> None:
-    if not argslist:
-        return
-    if sql.count("%s") != 1:
-        raise ValueError("execute_values expects a single %s placeholder in SQL")
+            if type(payload) is not dict:
+                errors.append((idx, "non-object payload"))
+                continue
+            invoice_id = payload.get("invoice_id")
+            if not invoice_id:
+                errors.append((idx, "missing invoice_id"))
+                invoice_id = None
+            rows.append(
+                (
+                    idx,
+                    str(invoice_id) if invoice_id else None,
+                    payload,
+                    parse_timestamp(payload.get("created_time")),
+                    parse_timestamp(payload.get("updated_time")),
+                    parse_timestamp(payload.get("last_modified_time")),
+                )
+            )
+    return idx, rows, errors
 
-    value_template = template or "(" + ",".join(["%s"] * len(argslist[0])) + ")"
-    chunks = [argslist[i : i + page_size] for i in range(0, len(argslist), page_size)]
 
-    for chunk in chunks:
-        placeholders = ",".join([value_template] * len(chunk))
-        query = sql.replace("%s", placeholders)
-        flattened = []
-        for row in chunk:
-            flattened.extend(row)
-        cur.execute(query, flattened)
+def _iter_shard_results(
+    executor: ProcessPoolExecutor, tasks: List[Tuple[str, int, int]], window: int
+) -> Iterable[Tuple[int, List[Tuple], List[Tuple[int, str]]]]:
+    # executor.map은 샤드를 한꺼번에 제출하므로, DB 적재가 느리면 파일 전체의 파싱 결과가 부모에 쌓인다.
+    # 진행 중인 샤드를 window개로 제한하고, 제출 순서대로 꺼내 파일 기준 줄 번호를 복원할 수 있게 한다
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(_parse_shard, task))
+    while pending:
+        yield pending.popleft().result()
 
 
 def iter_records(
     path: Path,
+    workers: int = 1,
 ) -> Iterable[
-    Tuple[str, int, Optional[str], Json, Optional[datetime], Optional[datetime], Optional[datetime]]
+    Tuple[str, int, Optional[str], Jsonb, Optional[datetime], Optional[datetime], Optional[datetime]]
 ]:
     source_file = str(path)
-    with path.open("r", encoding="utf-8") as handle:
-        for idx, line in enumerate(handle, start=1):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                payload = json.loads(line)
-            except json.JSONDecodeError as exc:
-                print(f"{source_file}:{idx} json error: {exc}", file=sys.stderr)
-                continue
-            if not isinstance(payload, dict):
-                print(f"{source_file}:{idx} non-object payload", file=sys.stderr)
-                continue
-            invoice_id = payload.get("invoice_id")
-            if not invoice_id:
-                print(f"{source_file}:{idx} missing invoice_id", file=sys.stderr)
-                invoice_id = None
-            created_time = parse_timestamp(payload.get("created_time"))
-            updated_time = parse_timestamp(payload.get("updated_time"))
-            last_modified_time = parse_timestamp(payload.get("last_modified_time"))
-            yield (
-                source_file,
-                idx,
-                str(invoice_id) if invoice_id else None,
-                Json(payload),
-                created_time,
-                updated_time,
-                last_modified_time,
-            )
+    with path.open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # 샤드 하나의 결과가 통째로 부모에 전달되므로 샤드 크기를 SHARD_BYTES 이하로 제한
+            shards = -(-size // SHARD_BYTES)
+            tasks = [(source_file, start, end) for start, end in _shard_ranges(mm, shards)]
+
+    if workers <= 1 or len(tasks) == 1:
+        results = map(_parse_shard, tasks)
+        executor = None
+    else:
+        # 호출자가 이미 스레드를 돌리고 있을 수 있으므로 (main의 DB 연결 풀 등) fork 대신 spawn으로 띄운다
+        # (스레드가 잡고 있던 락이 자식에 복사되면 교착될 수 있다)
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        results = _iter_shard_results(executor, tasks, workers * 2)
+
+    try:
+        offset = 0
+        for line_count, rows, errors in results:
+            for idx, message in errors:
+                print(f"{source_file}:{offset + idx} {message}", file=sys.stderr)
+            for idx, invoice_id, payload, created_time, updated_time, last_modified_time in rows:
+                yield (
+                    source_file,
+                    offset + idx,
+                    invoice_id,
+                    # 서버로 보낼 때도 orjson으로 직렬화 (stdlib json.dumps보다 빠르고 bytes를 바로 돌려준다)
+                    Jsonb(payload, dumps=orjson.dumps),
+                    created_time,
+                    updated_time,
+                    last_modified_time,
+                )
+            offset += line_count
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
 
 
 def upsert_batch(conn: psycopg.Connection, rows: List[Tuple]) -> None:
     if not rows:
         return
-    ingested_at = datetime.now(timezone.utc)
-    rows_with_ingest = [row + (ingested_at,) for row in rows]
-    sql = """
-        INSERT INTO invoice_raw (
-            source_file,
-            line_no,
-            invoice_id,
-            raw_json,
-            created_time,
-            updated_time,
-            last_modified_time,
-            ingested_at
-        ) VALUES %s
-        ON CONFLICT (source_file, line_no)
-        DO UPDATE SET
-            raw_json = EXCLUDED.raw_json,
-            created_time = EXCLUDED.created_time,
-            updated_time = EXCLUDED.updated_time,
-            last_modified_time = EXCLUDED.last_modified_time,
-            ingested_at = EXCLUDED.ingested_at
-    """
+    # COPY로 임시 스테이징 테이블에 적재한 뒤 한 번의 INSERT ... SELECT로 upsert
+    # 커밋은 호출자가 한다 (ON CONFLICT라 재실행해도 안전)
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows_with_ingest)
-    conn.commit()
+        # 스테이징 테이블은 연결(세션)당 한 번만 만들어지고, 이후 호출에서는 no-op
+        # (롤백으로 생성이 취소돼도 다음 호출에서 다시 만들어진다)
+        cur.execute(STAGE_CREATE_SQL)
+        with cur.copy(STAGE_COPY_SQL) as copy:
+            for row in rows:
+                copy.write_row(row)
+        cur.execute(STAGE_UPSERT_SQL)
+        cur.execute(STAGE_TRUNCATE_SQL)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Load invoices.jsonl into invoice_raw.")
     parser.add_argument("--src", default="data/invoices.jsonl", help="Path to invoices.jsonl")
-    parser.add_argument("--batch", type=int, default=500, help="Batch size")
+    parser.add_argument("--batch", type=int, default=5000, help="Batch size")
+    parser.add_argument(
+        "--workers", type=int, default=DB_WORKERS, help="Parallel DB connections (1 = single transaction)"
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=PARSE_WORKERS,
+        help=f"JSONL parsing processes for files over 1 MiB (default {PARSE_WORKERS}, 1 = in-process)",
+    )
     args = parser.parse_args()
+    if args.parse_workers < 1:
+        parser.error("--parse-workers must be at least 1")
 
     src_path = Path(args.src)
     if not src_path.exists():
         print(f"Input file not found: {src_path}", file=sys.stderr)
         sys.exit(1)
 
-    conn = build_conn()
-    batch: List[Tuple] = []
-    total = 0
-
-    for row in iter_records(src_path):
-        batch.append(row)
-        if len(batch) >= args.batch:
+    if args.workers > 1:
+        # RAW_COMMIT_GROUP개 배치마다 별도 연결/트랜잭션으로 병렬 커밋
+        # (ON CONFLICT upsert라 부분 실패 후 재실행해도 안전)
+        with build_pool(args.workers) as pool:
+            batches = iter_batches(iter_records(src_path, args.parse_workers), args.batch)
+            total = run_batches(pool, upsert_batch, batches, args.workers, group=RAW_COMMIT_GROUP)
+    else:
+        conn = build_bulk_conn()
+        total = 0
+        for batch in iter_batches(iter_records(src_path, args.parse_workers), args.batch):
             upsert_batch(conn, batch)
             total += len(batch)
-            batch = []
-
-    if batch:
-        upsert_batch(conn, batch)
-        total += len(batch)
+        conn.commit()
 
     print(f"loaded: {total}")
 
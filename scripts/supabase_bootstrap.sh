@@ -60,6 +60,9 @@ echo "Running migrations..."
 x_off
 PGPASSWORD="${OWNER_PW}" psql "${OWNER_URL}" -v ON_ERROR_STOP=1 -f migrations/001_init.sql
 PGPASSWORD="${OWNER_PW}" psql "${OWNER_URL}" -v ON_ERROR_STOP=1 -f migrations/002_roles.sql
+# transform_invoices.py reads the invoice_raw_latest view and the zoho_try_* casts (014/015)
+PGPASSWORD="${OWNER_PW}" psql "${OWNER_URL}" -v ON_ERROR_STOP=1 -f migrations/014_invoice_raw_latest.sql
+PGPASSWORD="${OWNER_PW}" psql "${OWNER_URL}" -v ON_ERROR_STOP=1 -f migrations/015_transform_casts.sql
 x_on
 
 x_off
@@ -1,246 +1,20 @@
 import argparse
-import json
-import os
 import sys
-from datetime import date, datetime
-from decimal import Decimal
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
 
 import psycopg
-from psycopg.types.json import Json
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-def build_conn() -> psycopg.Connection:
-    required = ["PGHOST", "PGPORT", "PGDATABASE", "PGUSER", "PGPASSWORD"]
-    missing = [name for name in required if not os.getenv(name)]
-    if missing:
-        missing_list = ", ".join(missing)
-        print(
-            f"Missing env vars: {missing_list}. Required for Supabase/Postgres connection.",
-            file=sys.stderr,
-        )
-        print("Set PGSSLMODE=require for Supabase.", file=sys.stderr)
-        sys.exit(1)
-
-    sslmode = os.getenv("PGSSLMODE", "require")
-
-    return psycopg.connect(
-        host=os.getenv("PGHOST"),
-        port=os.getenv("PGPORT"),
-        dbname=os.getenv("PGDATABASE"),
-        user=os.getenv("PGUSER"),
-        password=os.getenv("PGPASSWORD"),
-        sslmode=sslmode,
-    )
-
-
-def json_dumps_default(obj) -> str:
-    return json.dumps(obj, default=str, ensure_ascii=False)
-
-
-def J(obj) -> Json:
-    return Json(obj, dumps=json_dumps_default)
-
-
-def execute_values(cur, sql, argslist, template=None, page_size=1000) -> None:
-    if not argslist:
-        return
-    if sql.count("%s") != 1:
-        raise ValueError("execute_values expects a single %s placeholder in SQL")
-
-    value_template = template or "(" + ",".join(["%s"] * len(argslist[0])) + ")"
-    chunks = [argslist[i : i + page_size] for i in range(0, len(argslist), page_size)]
-
-    for chunk in chunks:
-        placeholders = ",".join([value_template] * len(chunk))
-        query = sql.replace("%s", placeholders)
-        flattened = []
-        for row in chunk:
-            flattened.extend(row)
-        cur.execute(query, flattened)
-
-
-def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
-    if not value or not isinstance(value, str):
-        return None
-    trimmed = value.strip()
-    if not trimmed:
-        return None
+from scripts._dbpool import conn_kwargs
 
-    candidates = [trimmed]
-    if trimmed.endswith("Z"):
-        candidates.append(trimmed[:-1] + "+00:00")
 
-    if len(trimmed) >= 5 and trimmed[-5] in ["+", "-"]:
-        sign = trimmed[-5]
-        digits = trimmed[-4:]
-        if digits.isdigit():
-            candidates.append(trimmed + "00")
-            candidates.append(trimmed[:-5] + sign + digits[:2] + ":" + digits[2:])
-
-    if len(trimmed) >= 6 and trimmed[-6] in ["+", "-"] and trimmed[-3] == ":":
-        candidates.append(trimmed[:-6] + trimmed[-6:-3] + trimmed[-2:])
-
-    for candidate in candidates:
-        try:
-            return datetime.fromisoformat(candidate)
-        except ValueError:
-            pass
-        for fmt in (
-            "%Y-%m-%dT%H:%M:%S%z",
-            "%Y-%m-%d %H:%M:%S%z",
-            "%Y-%m-%dT%H:%M:%S.%f%z",
-        ):
-            try:
-                return datetime.strptime(candidate, fmt)
-            except ValueError:
-                continue
-    return None
-
-
-def parse_date(value: Optional[str]) -> Optional[date]:
-    if not value or not isinstance(value, str):
-        return None
-    try:
-        return date.fromisoformat(value)
-    except ValueError:
-        return None
-
-
-def parse_decimal(value: Any) -> Optional[Decimal]:
-    if value is None:
-        return None
-    if isinstance(value, Decimal):
-        return value
-    if isinstance(value, (int, float)):
-        return Decimal(str(value))
-    if isinstance(value, str):
-        try:
-            return Decimal(value)
-        except Exception:
-            return None
-    return None
-
-
-def fetch_latest_raw(conn: psycopg.Connection) -> Iterable[Dict[str, Any]]:
-    sql = """
-        SELECT DISTINCT ON (invoice_id)
-            invoice_id,
-            raw_json,
-            updated_time,
-            last_modified_time,
-            created_time,
-            ingested_at
-        FROM invoice_raw
-        WHERE invoice_id IS NOT NULL AND invoice_id <> ''
-        ORDER BY invoice_id,
-                 COALESCE(last_modified_time, updated_time, created_time, ingested_at) DESC,
-                 ingested_at DESC
-    """
-    with conn.cursor() as cur:
-        cur.execute(sql)
-        rows = cur.fetchall()
-    results = []
-    for invoice_id, raw_json, updated_time, last_modified_time, created_time, ingested_at in rows:
-        if isinstance(raw_json, dict):
-            payload = raw_json
-        else:
-            payload = dict(raw_json)
-        payload["_invoice_id"] = invoice_id
-        payload["_updated_time"] = updated_time
-        payload["_last_modified_time"] = last_modified_time
-        payload["_created_time"] = created_time
-        payload["_ingested_at"] = ingested_at
-        results.append(payload)
-    return results
-
-
-def build_invoice_row(payload: Dict[str, Any]) -> Tuple:
-    updated_time = payload.get("_updated_time")
-    last_modified_time = payload.get("_last_modified_time")
-    created_time = payload.get("_created_time")
-    raw_invoice_url = payload.get("invoice_url")
-    invoice_url = raw_invoice_url.strip() if isinstance(raw_invoice_url, str) else None
-    if not invoice_url:
-        invoice_url = None
-
-    return (
-        payload.get("invoice_id"),
-        payload.get("invoice_number"),
-        parse_date(payload.get("date")),
-        parse_date(payload.get("due_date")),
-        payload.get("status"),
-        payload.get("current_sub_status"),
-        parse_decimal(payload.get("total")),
-        parse_decimal(payload.get("balance")),
-        payload.get("currency_code"),
-        payload.get("customer_id"),
-        payload.get("customer_name"),
-        invoice_url,
-        payload.get("salesperson_id"),
-        payload.get("salesperson_name"),
-        created_time,
-        updated_time,
-        last_modified_time,
-        J(payload),
-    )
-
-
-def extract_address(payload: Dict[str, Any], kind: str) -> Optional[Dict[str, Any]]:
-    key = f"{kind}_address"
-    value = payload.get(key)
-    if not isinstance(value, dict):
-        return None
-    return value
-
-
-def build_address_rows(payload: Dict[str, Any]) -> List[Tuple]:
-    rows: List[Tuple] = []
-    for kind in ("billing", "shipping"):
-        address = extract_address(payload, kind)
-        if not address:
-            continue
-        rows.append(
-            (
-                payload.get("invoice_id"),
-                kind,
-                address.get("attention"),
-                address.get("address"),
-                address.get("street2"),
-                address.get("city"),
-                address.get("state"),
-                address.get("zipcode") or address.get("zip"),
-                address.get("country"),
-                address.get("phone"),
-                J(address),
-            )
-        )
-    return rows
-
-
-def build_customer_row(payload: Dict[str, Any]) -> Optional[Tuple]:
-    customer_id = payload.get("customer_id")
-    if not customer_id:
-        return None
-    return (
-        customer_id,
-        payload.get("customer_name"),
-        payload.get("company_name"),
-        payload.get("email"),
-        payload.get("phone"),
-        payload.get("country"),
-        J(payload),
-        payload.get("_updated_time") or payload.get("_last_modified_time") or payload.get("_created_time"),
-    )
+def build_conn() -> psycopg.Connection:
+    return psycopg.connect(**conn_kwargs())
 
 
-def upsert_invoices(conn: psycopg.Connection, rows: List[Tuple]) -> None:
-    if not rows:
-        return
-    deduped = {row[0]: row for row in rows}
-    if len(deduped) != len(rows):
-        print(f"invoices batch: {len(rows)} -> {len(deduped)} after dedupe")
-    rows = list(deduped.values())
+def upsert_invoices(conn: psycopg.Connection) -> int:
+    # invoice_raw_latest(014)에서 바로 읽어 서버 안에서 변환/upsert (Python으로 payload를 왕복시키지 않음)
     sql = """
         INSERT INTO invoices (
             invoice_id,
@@ -261,7 +35,29 @@ def upsert_invoices(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             updated_time,
             last_modified_time,
             raw_json
-        ) VALUES %s
+        )
+        SELECT
+            r.invoice_id,
+            r.raw_json->>'invoice_number',
+            zoho_try_date(r.raw_json->>'date'),
+            zoho_try_date(r.raw_json->>'due_date'),
+            r.raw_json->>'status',
+            r.raw_json->>'current_sub_status',
+            zoho_try_numeric(r.raw_json->>'total'),
+            zoho_try_numeric(r.raw_json->>'balance'),
+            r.raw_json->>'currency_code',
+            r.raw_json->>'customer_id',
+            r.raw_json->>'customer_name',
+            CASE WHEN jsonb_typeof(r.raw_json->'invoice_url') = 'string'
+                THEN NULLIF(btrim(r.raw_json->>'invoice_url', E' \\t\\n\\r'), '')
+            END,
+            r.raw_json->>'salesperson_id',
+            r.raw_json->>'salesperson_name',
+            r.created_time,
+            r.updated_time,
+            r.last_modified_time,
+            r.raw_json
+        FROM invoice_raw_latest r
         ON CONFLICT (invoice_id) DO UPDATE SET
             invoice_number = EXCLUDED.invoice_number,
             date = EXCLUDED.date,
@@ -284,17 +80,12 @@ def upsert_invoices(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             > COALESCE(invoices.last_modified_time, invoices.updated_time, invoices.created_time)
     """
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows)
-    conn.commit()
+        cur.execute(sql)
+        return cur.rowcount
 
 
-def upsert_addresses(conn: psycopg.Connection, rows: List[Tuple]) -> None:
-    if not rows:
-        return
-    deduped = {(row[0], row[1]): row for row in rows}
-    if len(deduped) != len(rows):
-        print(f"addresses batch: {len(rows)} -> {len(deduped)} after dedupe")
-    rows = list(deduped.values())
+def upsert_addresses(conn: psycopg.Connection) -> int:
+    # billing/shipping 주소 객체를 인보이스당 최대 두 행으로 펼친다 (빈 객체나 객체가 아닌 값은 건너뜀)
     sql = """
         INSERT INTO invoice_addresses (
             invoice_id,
@@ -308,7 +99,26 @@ def upsert_addresses(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             country,
             phone,
             raw_json
-        ) VALUES %s
+        )
+        SELECT
+            r.invoice_id,
+            a.kind,
+            a.address->>'attention',
+            a.address->>'address',
+            a.address->>'street2',
+            a.address->>'city',
+            a.address->>'state',
+            COALESCE(NULLIF(a.address->>'zipcode', ''), a.address->>'zip'),
+            a.address->>'country',
+            a.address->>'phone',
+            a.address
+        FROM invoice_raw_latest r
+        CROSS JOIN LATERAL (
+            VALUES
+                ('billing', r.raw_json->'billing_address'),
+                ('shipping', r.raw_json->'shipping_address')
+        ) AS a(kind, address)
+        WHERE jsonb_typeof(a.address) = 'object' AND a.address <> '{}'::jsonb
         ON CONFLICT (invoice_id, kind) DO UPDATE SET
             attention = EXCLUDED.attention,
             address = EXCLUDED.address,
@@ -321,17 +131,13 @@ def upsert_addresses(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             raw_json = EXCLUDED.raw_json
     """
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows)
-    conn.commit()
+        cur.execute(sql)
+        return cur.rowcount
 
 
-def upsert_customers(conn: psycopg.Connection, rows: List[Tuple]) -> None:
-    if not rows:
-        return
-    deduped = {row[0]: row for row in rows}
-    if len(deduped) != len(rows):
-        print(f"customers batch: {len(rows)} -> {len(deduped)} after dedupe")
-    rows = list(deduped.values())
+def upsert_customers(conn: psycopg.Connection) -> int:
+    # 같은 고객이 여러 인보이스에 나오므로 updated_at이 가장 최신인 인보이스 하나만 고른다
+    # (한 INSERT 안에서 같은 키를 두 번 갱신할 수 없다)
     sql = """
         INSERT INTO customers (
             customer_id,
@@ -342,7 +148,25 @@ def upsert_customers(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             country,
             raw_json,
             updated_at
-        ) VALUES %s
+        )
+        SELECT DISTINCT ON (c.customer_id)
+            c.customer_id,
+            c.raw_json->>'customer_name',
+            c.raw_json->>'company_name',
+            c.raw_json->>'email',
+            c.raw_json->>'phone',
+            c.raw_json->>'country',
+            c.raw_json,
+            c.updated_at
+        FROM (
+            SELECT
+                r.raw_json->>'customer_id' AS customer_id,
+                r.raw_json,
+                COALESCE(r.updated_time, r.last_modified_time, r.created_time) AS updated_at
+            FROM invoice_raw_latest r
+        ) c
+        WHERE c.customer_id IS NOT NULL AND c.customer_id <> ''
+        ORDER BY c.customer_id, c.updated_at DESC NULLS LAST
         ON CONFLICT (customer_id) DO UPDATE SET
             customer_name = EXCLUDED.customer_name,
             company_name = EXCLUDED.company_name,
@@ -355,45 +179,25 @@ def upsert_customers(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             > COALESCE(customers.updated_at, '1970-01-01'::timestamptz)
     """
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows)
-    conn.commit()
+        cur.execute(sql)
+        return cur.rowcount
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Transform invoice_raw into normalized tables.")
     parser.add_argument("--skip-customers", action="store_true", help="Skip customers table")
-    parser.add_argument("--batch", type=int, default=500, help="Batch size")
     args = parser.parse_args()
 
-    conn = build_conn()
-    payloads = fetch_latest_raw(conn)
-
-    invoices_rows: List[Tuple] = []
-    address_rows: List[Tuple] = []
-    customer_rows: List[Tuple] = []
-
-    for payload in payloads:
-        invoices_rows.append(build_invoice_row(payload))
-        address_rows.extend(build_address_rows(payload))
-        customer_row = build_customer_row(payload)
-        if customer_row:
-            customer_rows.append(customer_row)
-
-    if not args.skip_customers and customer_rows:
-        for start in range(0, len(customer_rows), args.batch):
-            upsert_customers(conn, customer_rows[start : start + args.batch])
-
-    for start in range(0, len(invoices_rows), args.batch):
-        upsert_invoices(conn, invoices_rows[start : start + args.batch])
-
-    if address_rows:
-        for start in range(0, len(address_rows), args.batch):
-            upsert_addresses(conn, address_rows[start : start + args.batch])
+    # FK 순서(customers → invoices → addresses)대로 세 문장을 한 트랜잭션에서 실행
+    with build_conn() as conn:
+        customers = None if args.skip_customers else upsert_customers(conn)
+        invoices = upsert_invoices(conn)
+        addresses = upsert_addresses(conn)
 
-    print(f"invoices upserted: {len(invoices_rows)}")
-    print(f"addresses upserted: {len(address_rows)}")
-    if not args.skip_customers:
-        print(f"customers upserted: {len(customer_rows)}")
+    print(f"invoices upserted: {invoices}")
+    print(f"addresses upserted: {addresses}")
+    if customers is not None:
+        print(f"customers upserted: {customers}")
 
 
 if __name__ == "__main__":
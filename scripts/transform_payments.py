@@ -10,46 +10,24 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import psycopg
-from psycopg.types.json import Json
 
-from scripts.transform_invoices import (
-    build_conn,
-    execute_values,
-    parse_date,
-    parse_decimal,
-    parse_timestamp,
-)
-
-
-def json_dumps_default(obj) -> str:
-    import json
-    return json.dumps(obj, default=str, ensure_ascii=False)
-
-
-def J(obj) -> Json:
-    return Json(obj, dumps=json_dumps_default)
+from scripts._dbpool import UPSERT_BATCH_SIZE, J, parse_decimal
+from scripts._timeutil import parse_date, parse_timestamp
+from scripts.transform_invoices import build_conn
 
 
 def fetch_latest_raw_payments(conn: psycopg.Connection) -> List[Dict[str, Any]]:
     sql = """
         SELECT DISTINCT ON (payment_id)
-            payment_id,
-            raw_json,
-            ingested_at
+            raw_json
         FROM payment_raw
         WHERE payment_id IS NOT NULL AND payment_id <> ''
         ORDER BY payment_id, ingested_at DESC
     """
     with conn.cursor() as cur:
         cur.execute(sql)
-        rows = cur.fetchall()
-    results = []
-    for payment_id, raw_json, ingested_at in rows:
-        payload = raw_json if isinstance(raw_json, dict) else dict(raw_json)
-        payload["_payment_id"] = payment_id
-        payload["_ingested_at"] = ingested_at
-        results.append(payload)
-    return results
+        # raw_json은 orjson으로 dict로 디코딩되어 오므로 복사나 메타 키 추가 없이 그대로 넘긴다
+        return [raw_json for (raw_json,) in cur]
 
 
 def build_payment_row(payload: Dict[str, Any]) -> Tuple:
@@ -110,7 +88,7 @@ def upsert_payments(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             account_id, account_name,
             created_time, updated_time, last_modified_time,
             raw_json
-        ) VALUES %s
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (payment_id) DO UPDATE SET
             customer_id = EXCLUDED.customer_id,
             customer_name = EXCLUDED.customer_name,
@@ -130,8 +108,7 @@ def upsert_payments(conn: psycopg.Connection, rows: List[Tuple]) -> None:
             raw_json = EXCLUDED.raw_json
     """
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows)
-    conn.commit()
+        cur.executemany(sql, rows)
 
 
 def upsert_payment_invoices(conn: psycopg.Connection, rows: List[Tuple]) -> None:
@@ -142,19 +119,18 @@ def upsert_payment_invoices(conn: psycopg.Connection, rows: List[Tuple]) -> None
     sql = """
         INSERT INTO payment_invoices (
             payment_id, invoice_id, amount_applied, tax_amount_withheld
-        ) VALUES %s
+        ) VALUES (%s, %s, %s, %s)
         ON CONFLICT (payment_id, invoice_id) DO UPDATE SET
             amount_applied = EXCLUDED.amount_applied,
             tax_amount_withheld = EXCLUDED.tax_amount_withheld
     """
     with conn.cursor() as cur:
-        execute_values(cur, sql, rows)
-    conn.commit()
+        cur.executemany(sql, rows)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Transform payment_raw into normalized tables.")
-    parser.add_argument("--batch", type=int, default=500, help="Batch size")
+    parser.add_argument("--batch", type=int, default=UPSERT_BATCH_SIZE, help="Batch size")
     args = parser.parse_args()
 
     conn = build_conn()
@@ -167,11 +143,14 @@ def main() -> None:
         payment_rows.append(build_payment_row(payload))
         pi_rows.extend(build_payment_invoice_rows(payload))
 
-    for start in range(0, len(payment_rows), args.batch):
-        upsert_payments(conn, payment_rows[start : start + args.batch])
+    # upsert 함수는 커밋하지 않으므로 두 테이블을 파이프라인 하나로 보내고 한 번만 커밋
+    with conn.pipeline():
+        for start in range(0, len(payment_rows), args.batch):
+            upsert_payments(conn, payment_rows[start : start + args.batch])
 
-    for start in range(0, len(pi_rows), args.batch):
-        upsert_payment_invoices(conn, pi_rows[start : start + args.batch])
+        for start in range(0, len(pi_rows), args.batch):
+            upsert_payment_invoices(conn, pi_rows[start : start + args.batch])
+    conn.commit()
 
     print(f"customer_payments upserted: {len(payment_rows)}")
     print(f"payment_invoices upserted: {len(pi_rows)}")
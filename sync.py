@@ -15,7 +15,6 @@ import os
 import sys
 import time
 from datetime import datetime
-from decimal import Decimal
 from pathlib import Path
 from typing import List, Optional, Tuple
 from zoneinfo import ZoneInfo
@@ -26,13 +25,10 @@ load_dotenv()
 
 # -- 기존 모듈 import --
 from export import ensure_dir, export_resource
+from scripts._dbpool import UPSERT_BATCH_SIZE, J, parse_decimal
 from scripts.load_raw_invoices import build_conn, iter_records, upsert_batch
 from scripts.load_raw_payments import iter_payment_records, upsert_payment_batch
 from scripts.transform_invoices import (
-    build_address_rows,
-    build_customer_row,
-    build_invoice_row,
-    fetch_latest_raw,
     upsert_addresses,
     upsert_customers,
     upsert_invoices,
@@ -52,7 +48,9 @@ TZ = ZoneInfo("Asia/Seoul")
 DATA_DIR = Path("data")
 STATE_FILE = DATA_DIR / "sync_state.json"
 LOCK_FILE = DATA_DIR / "sync.lock"
-BATCH_SIZE = 500
+BATCH_SIZE = UPSERT_BATCH_SIZE
+# raw 적재는 파일 전체를 한 트랜잭션으로 커밋하므로 배치를 크게 잡는다
+LOAD_BATCH_SIZE = 5000
 
 
 # ── Lock ────────────────────────────────────────────────────────────
@@ -135,9 +133,10 @@ def step_load_raw(conn, jsonl_path: str) -> int:
     batch: List[Tuple] = []
     total = 0
 
+    # 델타 파일은 작으므로 프로세스 풀 없이 현재 프로세스에서 파싱 (workers=1 기본값)
     for row in iter_records(path):
         batch.append(row)
-        if len(batch) >= BATCH_SIZE:
+        if len(batch) >= LOAD_BATCH_SIZE:
             upsert_batch(conn, batch)
             total += len(batch)
             batch = []
@@ -145,6 +144,7 @@ def step_load_raw(conn, jsonl_path: str) -> int:
     if batch:
         upsert_batch(conn, batch)
         total += len(batch)
+    conn.commit()
 
     return total
 
@@ -160,7 +160,7 @@ def step_load_raw_payments(conn, jsonl_path: str) -> int:
 
     for row in iter_payment_records(path):
         batch.append(row)
-        if len(batch) >= BATCH_SIZE:
+        if len(batch) >= LOAD_BATCH_SIZE:
             upsert_payment_batch(conn, batch)
             total += len(batch)
             batch = []
@@ -168,39 +168,21 @@ def step_load_raw_payments(conn, jsonl_path: str) -> int:
     if batch:
         upsert_payment_batch(conn, batch)
         total += len(batch)
+    conn.commit()
 
     return total
 
 
 def step_transform(conn) -> dict:
     """Step 3a: invoice_raw → invoices, customers, invoice_addresses. 반환: 각 테이블 건수."""
-    payloads = fetch_latest_raw(conn)
-
-    invoices_rows: List[Tuple] = []
-    address_rows: List[Tuple] = []
-    customer_rows: List[Tuple] = []
-
-    for payload in payloads:
-        invoices_rows.append(build_invoice_row(payload))
-        address_rows.extend(build_address_rows(payload))
-        customer_row = build_customer_row(payload)
-        if customer_row:
-            customer_rows.append(customer_row)
-
-    for start in range(0, len(customer_rows), BATCH_SIZE):
-        upsert_customers(conn, customer_rows[start : start + BATCH_SIZE])
-
-    for start in range(0, len(invoices_rows), BATCH_SIZE):
-        upsert_invoices(conn, invoices_rows[start : start + BATCH_SIZE])
-
-    for start in range(0, len(address_rows), BATCH_SIZE):
-        upsert_addresses(conn, address_rows[start : start + BATCH_SIZE])
-
-    return {
-        "invoices": len(invoices_rows),
-        "customers": len(customer_rows),
-        "addresses": len(address_rows),
+    # 변환은 서버 안의 INSERT ... SELECT 세 문장 (FK 순서대로, 한 번만 커밋)
+    counts = {
+        "customers": upsert_customers(conn),
+        "invoices": upsert_invoices(conn),
+        "addresses": upsert_addresses(conn),
     }
+    conn.commit()
+    return counts
 
 
 def step_transform_payments(conn) -> dict:
@@ -214,11 +196,13 @@ def step_transform_payments(conn) -> dict:
         payment_rows.append(build_payment_row(payload))
         pi_rows.extend(build_payment_invoice_rows(payload))
 
-    for start in range(0, len(payment_rows), BATCH_SIZE):
-        upsert_payments(conn, payment_rows[start : start + BATCH_SIZE])
+    with conn.pipeline():
+        for start in range(0, len(payment_rows), BATCH_SIZE):
+            upsert_payments(conn, payment_rows[start : start + BATCH_SIZE])
 
-    for start in range(0, len(pi_rows), BATCH_SIZE):
-        upsert_payment_invoices(conn, pi_rows[start : start + BATCH_SIZE])
+        for start in range(0, len(pi_rows), BATCH_SIZE):
+            upsert_payment_invoices(conn, pi_rows[start : start + BATCH_SIZE])
+    conn.commit()
 
     return {
         "customer_payments": len(payment_rows),
@@ -242,8 +226,6 @@ def step_fetch_line_items(client: ZohoClient, conn) -> int:
     if not invoice_ids:
         return 0
 
-    from psycopg.types.json import Json
-
     total = 0
     for invoice_id in invoice_ids:
         try:
@@ -267,14 +249,6 @@ def step_fetch_line_items(client: ZohoClient, conn) -> int:
             if not line_item_id:
                 continue
 
-            def to_decimal(val):
-                if val is None:
-                    return None
-                try:
-                    return Decimal(str(val))
-                except Exception:
-                    return None
-
             cur = conn.cursor()
             cur.execute("""
                 INSERT INTO invoice_line_items
@@ -300,15 +274,15 @@ def step_fetch_line_items(client: ZohoClient, conn) -> int:
                 item.get("name"),
                 item.get("description"),
                 item.get("sku"),
-                to_decimal(item.get("rate")),
-                to_decimal(item.get("quantity")),
-                to_decimal(item.get("discount")),
-                to_decimal(item.get("tax_percentage")),
-                to_decimal(item.get("item_total")),
+                parse_decimal(item.get("rate")),
+                parse_decimal(item.get("quantity")),
+                parse_decimal(item.get("discount")),
+                parse_decimal(item.get("tax_percentage")),
+                parse_decimal(item.get("item_total")),
                 str(item.get("item_id", "")) or None,
                 item.get("unit"),
                 item.get("hsn_or_sac"),
-                Json(item),
+                J(item),
             ))
             conn.commit()
             total += 1
@@ -1,34 +1,142 @@
+import hashlib
+import json
 import os
-import requests
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import orjson
 from dotenv import load_dotenv
 
+from zoho_http import SESSION
+
 load_dotenv()
 
-def refresh_access_token() -> str:
-    accounts_url = os.getenv("ZOHO_ACCOUNTS_URL", "https://accounts.zoho.com").rstrip("/")
-    client_id = os.getenv("ZOHO_CLIENT_ID")
-    client_secret = os.getenv("ZOHO_CLIENT_SECRET")
-    refresh_token = os.getenv("ZOHO_REFRESH_TOKEN")
 
-    if not all([client_id, client_secret, refresh_token]):
+@dataclass(frozen=True, slots=True)
+class ZohoConfig:
+    accounts_url: str
+    api_domain: str
+    client_id: Optional[str]
+    client_secret: Optional[str] = field(repr=False)
+    refresh_token: Optional[str] = field(repr=False)
+    org_id: Optional[str]
+
+    @classmethod
+    def from_env(cls) -> "ZohoConfig":
+        return cls(
+            accounts_url=os.getenv("ZOHO_ACCOUNTS_URL", "https://accounts.zoho.com").rstrip("/"),
+            api_domain=os.getenv("ZOHO_API_DOMAIN", "https://www.zohoapis.com").rstrip("/"),
+            client_id=os.getenv("ZOHO_CLIENT_ID"),
+            client_secret=os.getenv("ZOHO_CLIENT_SECRET"),
+            refresh_token=os.getenv("ZOHO_REFRESH_TOKEN"),
+            org_id=os.getenv("ZOHO_ORG_ID"),
+        )
+
+
+CONFIG = ZohoConfig.from_env()
+TOKEN_URL = f"{CONFIG.accounts_url}/oauth/v2/token"
+
+# 실행 위치와 상관없이 같은 캐시를 쓰도록 저장소 디렉터리에 고정
+TOKEN_CACHE_PATH = Path(__file__).resolve().parent / ".zoho_token_cache.json"
+# 만료 5분 전에 미리 갱신
+TOKEN_EXPIRY_MARGIN = 300
+
+# 프로세스 안의 모든 ZohoClient/스레드가 공유하는 토큰 (파일 캐시를 매번 읽지 않음)
+_TOKEN_LOCK = threading.Lock()
+_memory_token: Dict[str, object] = {"value": None, "expires_at": 0.0}
+
+
+def _token_cache_key(config: ZohoConfig) -> str:
+    # refresh token 교체나 데이터센터(accounts_url) 변경 시 예전 자격 증명으로 받은 토큰을 재사용하지 않도록
+    # 세 값을 묶어 해시한다 (refresh token 원문은 캐시 파일에 남기지 않음)
+    material = "\n".join([config.client_id or "", config.refresh_token or "", config.accounts_url])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _read_token_cache(cache_key: str) -> Optional[Tuple[str, float]]:
+    try:
+        with open(TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("key") != cache_key:
+        return None
+    token = cache.get("access_token")
+    expires_at = cache.get("expires_at")
+    if not token or not isinstance(expires_at, (int, float)):
+        return None
+    if time.time() >= expires_at:
+        return None
+    return token, float(expires_at)
+
+
+def _write_token_cache(cache_key: str, data: Dict[str, object], issued_at: float) -> float:
+    try:
+        expires_in = int(data.get("expires_in", 3600))
+    except (TypeError, ValueError):
+        expires_in = 3600
+    expires_at = issued_at + expires_in - TOKEN_EXPIRY_MARGIN
+    cache = {
+        "key": cache_key,
+        "access_token": data["access_token"],
+        "expires_at": expires_at,
+    }
+    tmp_path = f"{TOKEN_CACHE_PATH}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except OSError:
+        pass
+    return expires_at
+
+
+def refresh_access_token() -> str:
+    if not all([CONFIG.client_id, CONFIG.client_secret, CONFIG.refresh_token]):
         raise RuntimeError("Missing env vars: ZOHO_CLIENT_ID / ZOHO_CLIENT_SECRET / ZOHO_REFRESH_TOKEN")
 
-    token_url = f"{accounts_url}/oauth/v2/token"
     params = {
-        "refresh_token": refresh_token,
-        "client_id": client_id,
-        "client_secret": client_secret,
+        "refresh_token": CONFIG.refresh_token,
+        "client_id": CONFIG.client_id,
+        "client_secret": CONFIG.client_secret,
         "grant_type": "refresh_token",
     }
 
-    r = requests.post(token_url, data=params, timeout=30)
+    issued_at = time.time()
+    r = SESSION.post(TOKEN_URL, data=params, timeout=30)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
 
     if "access_token" not in data:
         raise RuntimeError(f"Failed to refresh access token: {data}")
 
+    expires_at = _write_token_cache(_token_cache_key(CONFIG), data, issued_at)
+    _memory_token.update(value=data["access_token"], expires_at=expires_at)
     return data["access_token"]
 
+
 def get_access_token() -> str:
-    return refresh_access_token()
+    # 락 안에서 확인/갱신하므로 여러 스레드가 동시에 만료를 봐도 refresh는 한 번만 나간다
+    with _TOKEN_LOCK:
+        if _memory_token["value"] and time.time() < _memory_token["expires_at"]:
+            return _memory_token["value"]
+        cached = _read_token_cache(_token_cache_key(CONFIG))
+        if cached:
+            _memory_token.update(value=cached[0], expires_at=cached[1])
+            return cached[0]
+        return refresh_access_token()
+
+
+def invalidate_access_token(access_token: str) -> None:
+    """Forget access_token after the API rejected it (no-op if another thread already replaced it)."""
+    with _TOKEN_LOCK:
+        if _memory_token["value"] == access_token:
+            _memory_token.update(value=None, expires_at=0.0)
+            try:
+                os.remove(TOKEN_CACHE_PATH)
+            except OSError:
+                pass
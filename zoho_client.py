@@ -1,12 +1,12 @@
-import json
-import os
-import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Generator, Iterable, Optional, Tuple
 
+import orjson
 import requests
 from dotenv import load_dotenv
 
-from zoho_auth import refresh_access_token
+from zoho_auth import CONFIG, get_access_token, invalidate_access_token
+from zoho_http import build_retry, build_session
 
 load_dotenv()
 
@@ -20,37 +20,27 @@ class ZohoClient:
         backoff_base: float = 1.0,
         backoff_max: float = 60.0,
     ) -> None:
-        self.api_domain = (api_domain or os.getenv("ZOHO_API_DOMAIN", "https://www.zohoapis.com")).rstrip("/")
-        self.org_id = org_id or os.getenv("ZOHO_ORG_ID")
+        self.api_domain = (api_domain or CONFIG.api_domain).rstrip("/")
+        self.org_id = org_id or CONFIG.org_id
         self.timeout = timeout
         self.max_retries = max_retries
         self.backoff_base = backoff_base
         self.backoff_max = backoff_max
-        self.session = requests.Session()
-        self.access_token = refresh_access_token()
+        # 429/5xx/연결 오류 재시도는 어댑터의 urllib3 Retry가 담당
+        self.session = build_session(
+            retries=build_retry(total=max_retries, backoff_factor=backoff_base, backoff_max=backoff_max)
+        )
+        # 토큰은 첫 요청 때 모듈 공유 캐시에서 가져온다 (요청을 안 보내는 인스턴스는 토큰 왕복이 없음)
+        self.access_token: Optional[str] = None
 
         if not self.org_id:
             raise RuntimeError("Missing env var: ZOHO_ORG_ID")
+        self.session.headers["X-com-zoho-books-organizationid"] = str(self.org_id)
 
-    def _auth_headers(self) -> Dict[str, str]:
-        return {
-            "Authorization": f"Zoho-oauthtoken {self.access_token}",
-            "X-com-zoho-books-organizationid": str(self.org_id),
-        }
-
-    def _sleep_with_backoff(self, attempt: int, retry_after: Optional[str] = None) -> None:
-        if retry_after:
-            try:
-                delay = max(1, int(retry_after))
-            except ValueError:
-                delay = None
-        else:
-            delay = None
-
-        if delay is None:
-            delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
-
-        time.sleep(delay)
+    def _set_access_token(self, access_token: str) -> None:
+        # 인증 헤더는 세션에 한 번만 넣고 토큰이 바뀔 때만 갱신 (요청마다 헤더 dict를 만들지 않음)
+        self.access_token = access_token
+        self.session.headers["Authorization"] = f"Zoho-oauthtoken {access_token}"
 
     def request(
         self,
@@ -58,57 +48,44 @@ class ZohoClient:
         path: str,
         params: Optional[Dict[str, object]] = None,
         json_body: Optional[Dict[str, object]] = None,
-        max_retries: Optional[int] = None,
     ) -> Dict[str, object]:
         url = f"{self.api_domain}{path}"
-        headers = self._auth_headers()
 
-        retry_on_token = True
-        retries = self.max_retries if max_retries is None else max_retries
-        for attempt in range(retries + 1):
+        for retry_on_token in (True, False):
+            access_token = get_access_token()
+            if access_token != self.access_token:
+                self._set_access_token(access_token)
             try:
                 resp = self.session.request(
                     method=method,
                     url=url,
-                    headers=headers,
                     params=params,
                     json=json_body,
                     timeout=self.timeout,
                 )
             except requests.RequestException as exc:
-                if attempt >= retries:
-                    raise RuntimeError(f"Request failed after retries: {exc}") from exc
-                self._sleep_with_backoff(attempt)
-                continue
+                raise RuntimeError(f"Request failed after retries: {exc}") from exc
 
             if resp.status_code == 401 or (
                 resp.status_code == 400 and "invalid_token" in resp.text.lower()
             ):
                 if retry_on_token:
-                    self.access_token = refresh_access_token()
-                    headers = self._auth_headers()
-                    retry_on_token = False
+                    invalidate_access_token(access_token)
                     continue
                 raise RuntimeError(f"Unauthorized after token refresh: {resp.text}")
 
             if resp.status_code == 429:
-                if attempt >= retries:
-                    raise RuntimeError(f"Rate limited after retries: {resp.text}")
-                self._sleep_with_backoff(attempt, resp.headers.get("Retry-After"))
-                continue
+                raise RuntimeError(f"Rate limited after retries: {resp.text}")
 
             if 500 <= resp.status_code <= 599:
-                if attempt >= retries:
-                    raise RuntimeError(f"Server error after retries: {resp.text}")
-                self._sleep_with_backoff(attempt)
-                continue
+                raise RuntimeError(f"Server error after retries: {resp.text}")
 
             if resp.status_code < 200 or resp.status_code >= 300:
                 raise RuntimeError(f"HTTP {resp.status_code}: {resp.text}")
 
             try:
-                return resp.json()
-            except json.JSONDecodeError as exc:
+                return orjson.loads(resp.content)
+            except orjson.JSONDecodeError as exc:
                 raise RuntimeError(f"Non-JSON response: {resp.text}") from exc
 
         raise RuntimeError("Request failed after retries.")
@@ -125,17 +102,27 @@ class ZohoClient:
         base_params = dict(params or {})
         base_params.setdefault("per_page", per_page)
 
-        while True:
-            page_params = dict(base_params)
-            page_params["page"] = page
-            payload = self.request("GET", path, params=page_params)
-
-            items = payload.get(list_key, [])
-            page_context = payload.get(page_context_key, {})
-            has_more = bool(page_context.get("has_more_page"))
-
-            yield page, items
-
-            if not has_more:
-                break
-            page += 1
+        payload = self.request("GET", path, params={**base_params, "page": page})
+        if not payload.get(page_context_key, {}).get("has_more_page"):
+            # 한 페이지로 끝나는 결과(인보이스별 결제 조회 등)는 prefetch 스레드를 만들지 않는다
+            yield page, payload.get(list_key, [])
+            return
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while True:
+                items = payload.get(list_key, [])
+                page_context = payload.get(page_context_key, {})
+                has_more = bool(page_context.get("has_more_page"))
+
+                # 호출자가 현재 페이지를 처리하는 동안 다음 페이지 요청을 미리 보낸다
+                if has_more:
+                    next_page = executor.submit(
+                        self.request, "GET", path, params={**base_params, "page": page + 1}
+                    )
+
+                yield page, items
+
+                if not has_more:
+                    break
+                payload = next_page.result()
+                page += 1
@@ -0,0 +1,59 @@
+import random
+from itertools import takewhile
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with jittered backoff: sleep uniform(backoff_factor, capped exponential)."""
+
+    def get_backoff_time(self) -> float:
+        # urllib3 2.x는 첫 재시도를 0초로 바로 보내므로, 예전 루프처럼 첫 재시도부터
+        # backoff_factor * 2^(n-1)을 상한으로 잡고 backoff_factor 이상은 기다린다
+        retries = sum(1 for _ in takewhile(lambda h: h.redirect_location is None, reversed(self.history)))
+        if retries == 0 or self.backoff_factor <= 0:
+            return 0.0
+        cap = min(self.backoff_max, self.backoff_factor * (2 ** (retries - 1)))
+        floor = min(self.backoff_factor, cap)
+        # 결정적 backoff면 동시에 429를 받은 클라이언트들이 같은 순간에 다시 몰린다
+        return random.uniform(floor, cap)
+
+
+def build_retry(total: int = 3, backoff_factor: float = 0.5, backoff_max: float = 60.0) -> Retry:
+    # 429/5xx는 같은 keep-alive 연결 안에서 재시도한다 (Retry-After 헤더가 있으면 그 값을 우선)
+    # POST(OAuth 토큰 교환 등)는 멱등이 아니므로 응답/읽기 오류 후에는 재전송하지 않는다
+    return JitteredRetry(
+        total=total,
+        backoff_factor=backoff_factor,
+        backoff_max=backoff_max,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+
+
+def build_session(
+    pool_connections: int = 4,
+    pool_maxsize: int = 20,
+    retries: Optional[Retry] = None,
+) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retries if retries is not None else build_retry(),
+    )
+    session.mount("https://", adapter)
+    # urllib3가 해제할 수 있는 인코딩만 요청 (brotli/zstandard가 설치돼 있으면 br/zstd 포함)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return session
+
+
+# 스크립트 전역에서 공유하는 keep-alive 세션 (TLS 핸드셰이크 재사용)
+SESSION = build_session()